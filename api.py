@@ -0,0 +1,74 @@
+"""
+Library entry point: no prompt, no fixed path, the sources come back as records
+
+    import api
+    mapping=api.loadMappings("filesMappings/classes-obf.txt","filesMappings/classes-deobf.txt")
+    for record in api.decompile("1.13.1.jar",mapping,workers=4):
+        store(record.deobfuscated or record.obfuscated,record.source)
+"""
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor,wait,FIRST_COMPLETED
+import backends,decompiler,jvm,tempfile,logging
+
+#deobfuscated is None for the classes the mappings don't know
+Record=namedtuple("Record",["obfuscated","deobfuscated","source"])
+#progress goes there rather than on stdout
+logger=logging.getLogger(__name__)
+
+
+def loadMappings(obf,deobf):
+    """Mapping set {obfuscated: deobfuscated} from a pair of mapping files"""
+    return decompiler.loadMappings(Path(obf),Path(deobf))
+
+
+def decompileBatch(jar,names,engines,flags=None,stats=None):
+    """
+    Decompile some classes in a scratch dir that is gone once their sources are read
+    :param flags: jvm flags, the module wide backends.jvmFlags when None
+    :param stats: engine speed file, None to keep none
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        if backends.decompile(jar,scratch,engines,classes=names,flags=flags,stats=stats or False,log=logger.info) is None:
+            raise RuntimeError("No decompiler could be launched, check the java it runs with")
+        sources={}
+        for name in names:
+            source=Path(scratch).joinpath(name+".java")
+            if source.exists():
+                sources[name]=source.read_text(errors="replace")
+        return sources
+
+
+def decompile(jar,mapping=None,workers=2,batch=200,engines=None,classes=None,stats=None,calibration=None,profile=None):
+    """
+    Lazily decompile a jar, in parallel, as (obfuscated, deobfuscated, source) records
+    At most workers batches are decompiled or waiting to be consumed at any time, so the
+    memory stays bounded however big the jar and however slow the consumer.
+    :param mapping: {obfuscated: deobfuscated}, None to leave the names alone
+    :param engines: backends to use, the ones in lib/ by default
+    :param classes: obfuscated names to decompile, None for the whole jar
+    :param stats: file the speed of the engines is kept in, None to keep none
+    :param calibration: jvm profile file written by jvm.calibrate, None to size the jvm from the machine only
+    :param profile: cfr options file written by tune.py, None for the cfr defaults
+    """
+    jar=Path(jar).resolve()
+    mapping=mapping or {}
+    engines=engines if engines is not None else backends.findBackends(Path(__file__).parent.joinpath("lib"),profile)
+    if not engines:
+        raise RuntimeError("No decompiler found, put cfr in lib/ or pass engines")
+    flags=jvm.flags(jvm.pick(workers,calibration),jar,workers)
+    names=backends.listClasses(jar) if classes is None else list(classes)
+    batches=iter([names[i:i+batch] for i in range(0,len(names),batch)])
+    with ThreadPoolExecutor(workers) as pool:
+        running=set()
+        while True:
+            for chunk in batches:
+                running.add(pool.submit(decompileBatch,jar,chunk,engines,flags,stats))
+                if len(running)>=workers:
+                    break
+            if not running:
+                return
+            done,running=wait(running,return_when=FIRST_COMPLETED)
+            for future in done:
+                for name,source in sorted(future.result().items()):
+                    yield Record(name,mapping.get(name),source)
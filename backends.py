@@ -0,0 +1,413 @@
+from pathlib import Path
+from shutil import copyfile
+import profiling,subprocess,tempfile,threading,zipfile,copy,json,time,os,re
+
+#every decompiler is a jar in lib/ that we launch with this java
+java="java"
+statsFile=Path("./backendStats.json")
+#cfr options recommended by tune.py, added to the default ones
+profileFile=Path("./cfrProfile.json")
+#how many classes go in one jarfilter/command line, windows chokes on long ones
+batchSize=400
+#several decompilations may run side by side, in threads or processes, and all of them record their stats
+statsLock=threading.Lock()
+#jvm flags of every launch, the heap is the memory budget (see jvm.py to size them)
+jvmFlags=["-Xmx2g"]
+#seconds a single class may take and seconds of jvm startup
+classTimeout=60
+startupTime=10
+#a batch may be this many times slower per class than the measured throughput before it gets killed
+slack=4
+
+
+class Backend(object):
+    """
+    A decompiler jar launched with java, one subclass per engine
+    """
+    name=None
+    #glob in lib/ to find the jar of the engine
+    pattern=None
+    #text the engine leaves in a source when it failed on (part of) the class
+    markers=()
+    #options of every launch
+    options=()
+    #option sets tried in turn when a class is retried alone
+    isolatedOptions=()
+    #java of this engine when it has a class-data sharing archive, which only works with the java that built it (see cds.py)
+    java=None
+    sharedArchive=None
+    #jvm flags of this engine, the module wide jvmFlags when None
+    flags=None
+
+    def __init__(self,jar):
+        self.jar=Path(jar).resolve()
+
+    def launch(self,args):
+        #dying on the first OutOfMemoryError beats thrashing the gc until the timeout
+        sharing=["-XX:SharedArchiveFile="+self.sharedArchive.__str__(),"-Xshare:auto"] if self.sharedArchive else []
+        flags=self.flags if self.flags is not None else jvmFlags
+        return [self.java or java]+flags+sharing+["-XX:+ExitOnOutOfMemoryError","-jar",self.jar.__str__()]+args
+
+    def command(self,jar,outdir,classes=None,files=None,options=()):
+        """
+        Command decompiling the whole jar into outdir, or only the given classes
+        :param classes: obfuscated names of the classes to decompile, None for all
+        :param files: the .class files of those classes extracted on disk
+        :param options: extra engine options
+        """
+        raise NotImplementedError
+
+    def needsFiles(self,classes):
+        """Whether the engine wants the classes extracted on disk rather than the jar"""
+        return classes is not None
+
+    def locate(self,outdir,name):
+        """Where the source of a class ends up in outdir, None if not produced"""
+        for candidate in (outdir.joinpath(name+".java"),outdir.joinpath(name.split("/")[-1]+".java")):
+            if candidate.exists():
+                return candidate
+
+    def succeeded(self,source):
+        """Check that a produced source is complete and has no failure marker"""
+        try:
+            text=source.read_text(errors="replace")
+        except OSError:
+            return False
+        if not text.rstrip().endswith("}"):
+            #truncated, the engine got killed while writing it
+            return False
+        return not any(marker in text for marker in self.markers)
+
+
+class CFR(Backend):
+    name="cfr"
+    pattern="cfr*.jar"
+    markers=("This method has failed to decompile","Exception decompiling")
+    options=("--caseinsensitivefs","true")
+    #first what cfr itself suggests when it fails, then skip the passes that tend to blow up
+    isolatedOptions=(("--forcetopsort","true","--forceexceptionprune","true"),
+                     ("--decodefinally","false","--decodelambdas","false","--recpass","0"))
+
+    def command(self,jar,outdir,classes=None,files=None,options=()):
+        args=[jar.__str__(),"--outputdir",outdir.__str__()]+list(self.options)
+        if classes is not None:
+            #cfr matches the filter against dotted class names
+            args+=["--jarfilter","^("+"|".join(re.escape(c.replace("/",".")) for c in classes)+")$"]
+        return self.launch(args+list(options))
+
+    def needsFiles(self,classes):
+        return False
+
+
+class Procyon(Backend):
+    name="procyon"
+    pattern="procyon*.jar"
+    markers=("could not be decompiled",)
+
+    def command(self,jar,outdir,classes=None,files=None,options=()):
+        options=list(self.options)+list(options)
+        if classes is None:
+            return self.launch(options+["-jar",jar.__str__(),"-o",outdir.__str__()])
+        return self.launch(options+["-o",outdir.__str__()]+[f.__str__() for f in files])
+
+
+class Fernflower(Backend):
+    name="fernflower"
+    pattern="fernflower*.jar"
+    markers=("$FF: Couldn't be decompiled",)
+    #cap the time spent on a single method
+    isolatedOptions=(("-mpm=10",),)
+
+    def command(self,jar,outdir,classes=None,files=None,options=()):
+        #fernflower turns a jar into a jar of sources, so it always works on extracted files
+        return self.launch(list(self.options)+list(options)+["-e="+jar.__str__()]+[f.__str__() for f in files]+[outdir.__str__()])
+
+    def needsFiles(self,classes):
+        return True
+
+
+engines=[CFR,Procyon,Fernflower]
+
+
+def findBackends(lib=Path("./lib"),profile=profileFile):
+    """
+    Every engine with a jar in lib/, in the default order of preference
+    :param profile: cfr options picked by tune.py, None for the cfr defaults
+    """
+    backends=[]
+    for engine in engines:
+        jars=sorted(Path(lib).glob(engine.pattern))
+        if jars:
+            backends.append(engine(jars[-1]))
+            if engine is CFR:
+                backends[-1].options=CFR.options+tunedOptions(profile)
+    return backends
+
+
+def tunedOptions(path=profileFile):
+    if path and Path(path).exists():
+        try:
+            return tuple(json.loads(Path(path).read_text())["options"])
+        except (ValueError,KeyError):
+            print("CFR profile is corrupted, ignoring it")
+    return ()
+
+
+def signature(backends):
+    """What decides the output for a given jar: the engines, their versions and options"""
+    return ";".join("{} {}".format(b.jar.name," ".join(b.options)) for b in backends)
+
+
+def loadStats(path=None,log=print):
+    path=Path(path or statsFile)
+    if path.exists():
+        try:
+            return json.loads(path.read_text())
+        except ValueError:
+            log("Backend stats are corrupted, starting over")
+    return {}
+
+
+def lockFile(path,wait=True):
+    """
+    Open path and lock it for this process, the system drops the lock if the process dies
+    :return: the open file, close it to unlock, None if another process has it and not wait
+    """
+    fid=open(path,"a+b")
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        while True:
+            try:
+                fid.seek(0)
+                msvcrt.locking(fid.fileno(),msvcrt.LK_NBLCK,1)
+                return fid
+            except OSError:
+                if not wait:
+                    break
+                time.sleep(0.1)
+    else:
+        try:
+            fcntl.flock(fid.fileno(),fcntl.LOCK_EX if wait else fcntl.LOCK_EX|fcntl.LOCK_NB)
+            return fid
+        except OSError:
+            pass
+    fid.close()
+    return None
+
+
+def saveStats(delta,path=None):
+    """Add the counters of a run to the stats on disk"""
+    path=Path(path or statsFile)
+    with statsLock:
+        lock=lockFile(path.with_name(path.name+".lock").__str__())
+        try:
+            stats=loadStats(path)
+            for name,counters in delta.items():
+                s=stats.setdefault(name,{"classes":0,"seconds":0.0,"failures":0,"runs":0})
+                for key,value in counters.items():
+                    s[key]+=value
+            fd,temp=tempfile.mkstemp(dir=path.parent.__str__(),prefix=path.name)
+            with os.fdopen(fd,"w") as fid:
+                fid.write(json.dumps(stats,indent=1,sort_keys=True))
+            os.replace(temp,path.__str__())
+        finally:
+            lock.close()
+
+
+def throughput(stats,backend):
+    """Classes decompiled per second by a backend so far, None if never measured"""
+    s=stats.get(backend.name)
+    if not s or not s["seconds"]:
+        return None
+    return s["classes"]/s["seconds"]
+
+
+def sortBackends(backends,stats):
+    """Fastest measured backend first, the ones never measured keep their default order"""
+    order={b.name:i for i,b in enumerate(backends)}
+    return sorted(backends,key=lambda b:(throughput(stats,b) is None,-(throughput(stats,b) or 0),order[b.name]))
+
+
+def listClasses(jar):
+    """Obfuscated names of the top level classes in the jar, the inner ones come with them"""
+    with zipfile.ZipFile(jar) as z:
+        return sorted(n[:-6] for n in z.namelist() if n.endswith(".class") and "$" not in n)
+
+
+def extractClasses(jar,classes,dest):
+    """Extract the given classes and their inner classes, return the outer .class files"""
+    wanted=set(classes)
+    files=[]
+    with zipfile.ZipFile(jar) as z:
+        for n in z.namelist():
+            if n.endswith(".class") and n[:-6].split("$")[0] in wanted:
+                target=dest.joinpath(n)
+                target.parent.mkdir(parents=True,exist_ok=True)
+                target.write_bytes(z.read(n))
+                if "$" not in n:
+                    files.append(target)
+    return files
+
+
+def budget(stats,backend,n):
+    """Wall-clock seconds a launch on n classes gets before being killed"""
+    speed=throughput(stats,backend)
+    perClass=classTimeout if not speed else min(classTimeout,slack/speed)
+    return startupTime+classTimeout+perClass*n
+
+
+def run(backend,jar,outdir,classes=None,stats=None,options=(),until=None,log=print):
+    """
+    Run a backend by batches, a batch over its budget is killed and whatever got written
+    is kept and checked by the caller, the classes it did not reach are split in two and
+    run again so a pathological class only costs its own batch
+    :param until: time.time() after which nothing is launched anymore, launches get cut at it
+    :param log: where the progress lines go
+    :return: False if the engine could not be launched at all
+    """
+    classes=listClasses(jar) if classes is None else list(classes)
+    batches=[classes[i:i+batchSize] for i in range(0,len(classes),batchSize)]
+    with tempfile.TemporaryDirectory() as staging:
+        launched=0
+        while batches:
+            batch=batches.pop(0)
+            timeout=budget(stats or {},backend,len(batch))
+            if until is not None:
+                timeout=min(timeout,until-time.time())
+                if timeout<=0:
+                    log("Deadline reached, {} launched no more".format(backend.name))
+                    break
+            files=None
+            if backend.needsFiles(batch):
+                files=extractClasses(jar,batch,Path(staging).joinpath(str(launched)))
+            launched+=1
+            t=time.time()
+            try:
+                subprocess.run(backend.command(jar,outdir,batch,files,options),timeout=timeout,
+                               stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+            except subprocess.TimeoutExpired:
+                log("{} killed after {:.0f}s on {} classes".format(backend.name,timeout,len(batch)))
+                missing=[c for c in batch if backend.locate(outdir,c) is None]
+                if len(missing)>1:
+                    batches[:0]=[missing[:len(missing)//2],missing[len(missing)//2:]]
+            except OSError as e:
+                log("Could not launch {}: {}".format(backend.name,e))
+                return False
+            finally:
+                profiling.subprocessTime(time.time()-t)
+    return True
+
+
+def collect(backend,target,outdir,names,ledger):
+    """Move what a run produced in target into outdir, return the classes that failed"""
+    failed=[]
+    for name in names:
+        source=backend.locate(target,name)
+        ok=source is not None and backend.succeeded(source)
+        if ok or (source and name not in ledger):
+            #a failed output is still kept in case nobody does better
+            destination=outdir.joinpath(name+".java")
+            if source!=destination:
+                destination.parent.mkdir(parents=True,exist_ok=True)
+                copyfile(source,destination)
+            ledger[name]=backend.name if ok else backend.name+" (failed)"
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+def stub(outdir,name,ledger):
+    """Write a placeholder for a class nothing could decompile, unless a readable partial output exists"""
+    destination=outdir.joinpath(name+".java")
+    if destination.exists() and destination.read_text(errors="replace").rstrip().endswith("}"):
+        return
+    destination.parent.mkdir(parents=True,exist_ok=True)
+    package,simple="/".join(name.split("/")[:-1]),name.split("/")[-1]
+    text="/*\n * Decompilation of {} failed with every backend and option set\n */\n".format(name)
+    if package:
+        text+="package {};\n\n".format(package.replace("/","."))
+    destination.write_text(text+"class {} {{\n}}\n".format(simple))
+    ledger[name]="failed"
+
+
+def decompile(jar,outdir,backends=None,deadline=None,classes=None,flags=None,stats=None,log=print):
+    """
+    Decompile every top level class of the jar into outdir, per class the fastest backend
+    is tried first and the failed classes fall back to the next one. What is left is retried
+    alone with every backend and option set, then gets a stub.
+    :param deadline: seconds after which the remaining classes go straight to a stub
+    :param classes: obfuscated names to decompile, None for the whole jar
+    :param flags: jvm flags of this decompilation, the module wide jvmFlags when None
+    :param stats: file the speed of the engines is read from and added to, statsFile when None,
+    False to neither read nor keep any
+    :param log: where the progress lines go
+    :return: the ledger {obfuscated name: backend that produced the file}, None if no backend starts
+    """
+    start=time.time()
+    until=start+deadline if deadline else None
+    jar=Path(jar).resolve()
+    outdir=Path(outdir)
+    outdir.mkdir(parents=True,exist_ok=True)
+    statsPath,stats=stats,loadStats(stats,log) if stats is not False else {}
+    backends=sortBackends(backends if backends is not None else findBackends(),stats)
+    if flags is not None:
+        #copies, the engines may be shared with decompilations running other flags
+        backends=[copy.copy(b) for b in backends]
+        for b in backends:
+            b.flags=flags
+    everything=listClasses(jar)
+    pending=everything if classes is None else list(classes)
+    ledger={}
+    delta={}
+    for backend in backends:
+        if not pending or (deadline and time.time()-start>deadline):
+            break
+        #the first engine writes the whole jar in place, the fallbacks only what is left in a scratch dir
+        whole=len(pending)==len(everything)
+        with tempfile.TemporaryDirectory() as scratch:
+            target=outdir if whole else Path(scratch)
+            t=time.time()
+            if not run(backend,jar,target,pending,stats,until=until,log=log):
+                #an engine that does not even start is not worth one retry per class
+                backends=[b for b in backends if b is not backend]
+                continue
+            elapsed=time.time()-t
+            failed=collect(backend,target,outdir,pending,ledger)
+        s=delta.setdefault(backend.name,{"classes":0,"seconds":0.0,"failures":0,"runs":0})
+        s["classes"]+=len(pending)-len(failed)
+        s["seconds"]+=elapsed
+        s["failures"]+=len(failed)
+        s["runs"]+=1
+        log("{}: {} classes in {:.1f}s, {} failed".format(backend.name,len(pending)-len(failed),elapsed,len(failed)))
+        pending=failed
+    if not backends:
+        log("No backend could be launched")
+        return None
+    #isolation, one jvm per class so a pathological one only takes itself down
+    if pending:
+        log("Retrying {} classes alone".format(len(pending)))
+    left=[]
+    for name in pending:
+        done=False
+        for backend in list(backends):
+            for options in ((),)+tuple(backend.isolatedOptions):
+                if done or (deadline and time.time()-start>deadline):
+                    break
+                with tempfile.TemporaryDirectory() as scratch:
+                    if not run(backend,jar,Path(scratch),[name],stats,options,until,log):
+                        backends.remove(backend)
+                        break
+                    done=not collect(backend,Path(scratch),outdir,[name],ledger)
+        if not backends:
+            log("No backend could be launched")
+            return None
+        if not done:
+            left.append(name)
+            stub(outdir,name,ledger)
+    if statsPath is not False:
+        saveStats(delta,statsPath)
+    if left:
+        log("{} classes failed with every backend: {}".format(len(left),", ".join(left)))
+    return ledger
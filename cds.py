@@ -0,0 +1,139 @@
+from pathlib import Path
+import backends,fingerprint,JDKcheck,jvm,subprocess,tempfile,hashlib,statistics,time,sys,os,re
+
+#one archive per jdk and cfr jar, a new jdk or cfr just builds another one
+archiveDir=Path("./cache/cds")
+#classes cfr decompiles in the training run, enough to load most of its own classes
+trainingSize=20
+
+
+def javaOf(jdk):
+    """The java of the JDK JDKcheck found (it gives its lib/ folder), the configured one if it found none"""
+    if jdk:
+        for name in ("java","java.exe"):
+            candidate=Path(jdk).parent.joinpath("bin",name)
+            if candidate.exists():
+                return candidate.__str__()
+    return backends.java
+
+
+def version(java):
+    """(major, full version text) of a java, (None, None) if it does not run"""
+    try:
+        result=subprocess.run([java,"-Xshare:off","-version"],stdout=subprocess.PIPE,stderr=subprocess.STDOUT,timeout=60)
+    except (OSError,subprocess.TimeoutExpired):
+        return None,None
+    text=result.stdout.decode(errors="replace")
+    found=re.search(r'version "(\d+)(?:\.(\d+))?',text)
+    if not found:
+        return None,text
+    major=int(found.group(1))
+    #1.8 and older
+    if major==1 and found.group(2):
+        major=int(found.group(2))
+    return major,text
+
+
+def archiveFile(cfr,text):
+    key=hashlib.sha1((text+fingerprint.fingerprint(cfr.jar)).encode()).hexdigest()[:16]
+    return archiveDir.joinpath("{}-{}.jsa".format(cfr.jar.stem,key))
+
+
+def training(cfr,java,jar,outdir,flags):
+    """Command decompiling a few classes of the jar with extra jvm flags"""
+    command=cfr.command(Path(jar).resolve(),Path(outdir),jvm.sample(jar,trainingSize))
+    return [java]+flags+command[1:]
+
+
+def build(cfr,java,jar,major,path):
+    """
+    Dump the classes cfr loads while it decompiles a sample of the jar into path
+    :return: whether the archive got written
+    """
+    path.parent.mkdir(parents=True,exist_ok=True)
+    #dumped aside then moved in, a run launching cfr meanwhile never maps a half written archive
+    temp=path.with_name("{}.{}.tmp".format(path.name,os.getpid()))
+    with tempfile.TemporaryDirectory() as out:
+        if major>=13:
+            #dynamic archive written when the jvm exits
+            subprocess.run(training(cfr,java,jar,out,["-XX:ArchiveClassesAtExit="+temp.__str__()]),
+                           stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        else:
+            classList=Path(out).joinpath("classes.lst")
+            subprocess.run(training(cfr,java,jar,out,["-Xshare:off","-XX:DumpLoadedClassList="+classList.__str__()]),
+                           stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+            #java 10 still wants appcds unlocked, later ones have it by default
+            unlock=["-XX:+UseAppCDS"] if major==10 else []
+            subprocess.run([java]+unlock+["-Xshare:dump","-XX:SharedClassListFile="+classList.__str__(),
+                            "-XX:SharedArchiveFile="+temp.__str__(),"-cp",cfr.jar.__str__()],
+                           stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+    if not temp.exists():
+        return False
+    os.replace(temp.__str__(),path.__str__())
+    return True
+
+
+def attach(engines,jar,jdk=None):
+    """
+    Give the cfr engines a class-data sharing archive, built once per jdk and cfr version,
+    so every launch maps cfr's classes instead of loading and verifying them again
+    :return: the archive, None if this java can't have one
+    """
+    java=javaOf(jdk)
+    for cfr in engines:
+        if not isinstance(cfr,backends.CFR):
+            continue
+        major,text=version(java)
+        if major is None:
+            print("Could not tell the version of {}, CFR launches without a CDS archive".format(java))
+            return None
+        if major<10:
+            print("Java {} has no application class-data sharing, CFR launches without a CDS archive".format(major))
+            return None
+        path=archiveFile(cfr,text)
+        if not path.exists():
+            t=time.time()
+            if not build(cfr,java,jar,major,path):
+                print("Could not build a CDS archive for {}".format(cfr.jar.name))
+                return None
+            print("CDS archive {} built in {:.1f}s".format(path,time.time()-t))
+        cfr.java=java
+        cfr.sharedArchive=path.resolve()
+        return path
+    return None
+
+
+def benchmark(jar,jdk=None,n=10):
+    """Median wall time of n single class cfr launches without then with the archive"""
+    cfr=[b for b in backends.findBackends() if isinstance(b,backends.CFR)]
+    if not cfr:
+        print("Missing a library: CFR")
+        return None
+    cfr=cfr[0]
+    if not attach([cfr],jar,jdk):
+        return None
+    archive=cfr.sharedArchive
+    classes=jvm.sample(jar,1)
+    times={"without":[],"with":[]}
+    with tempfile.TemporaryDirectory() as out:
+        #alternated so a warming disk cache favours neither
+        for _ in range(n):
+            for label in times:
+                cfr.sharedArchive=archive if label=="with" else None
+                t=time.time()
+                subprocess.run(cfr.command(Path(jar).resolve(),Path(out),classes),stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+                times[label].append(time.time()-t)
+    cfr.sharedArchive=archive
+    without,withArchive=statistics.median(times["without"]),statistics.median(times["with"])
+    print("CFR launch on one class: {:.3f}s without the archive, {:.3f}s with it ({:.0%} faster)".format(
+        without,withArchive,1-withArchive/without))
+    return without,withArchive
+
+
+if __name__=="__main__":
+    #python cds.py [launches], builds the archive if needed then times cfr with and without it
+    #decompiler imports this module, so only the command line imports it back
+    import decompiler
+    path=decompiler.findjar()
+    if path:
+        benchmark(path,JDKcheck.main() if decompiler.checkJDK else None,int(sys.argv[1]) if len(sys.argv)>1 else 10)
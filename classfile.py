@@ -0,0 +1,147 @@
+from struct import unpack_from
+import struct,zipfile,re
+
+#constant pool tags
+UTF8,INTEGER,FLOAT,LONG,DOUBLE,CLASS,STRING=1,3,4,5,6,7,8
+FIELDREF,METHODREF,INTERFACEMETHODREF,NAMEANDTYPE=9,10,11,12
+METHODHANDLE,METHODTYPE,DYNAMIC,INVOKEDYNAMIC,MODULE,PACKAGE=15,16,17,18,19,20
+#size of the constant of each tag after the tag byte, utf8 has its own length
+sizes={INTEGER:4,FLOAT:4,LONG:8,DOUBLE:8,CLASS:2,STRING:2,FIELDREF:4,METHODREF:4,INTERFACEMETHODREF:4,
+       NAMEANDTYPE:4,METHODHANDLE:3,METHODTYPE:2,DYNAMIC:4,INVOKEDYNAMIC:4,MODULE:2,PACKAGE:2}
+
+#an object type inside a descriptor, Lnet/minecraft/Foo;
+reference=re.compile(r"L([^;]+);")
+
+ACC_INTERFACE,ACC_ABSTRACT,ACC_ENUM=0x0200,0x0400,0x4000
+
+GETSTATIC,PUTSTATIC,GETFIELD,PUTFIELD=0xb2,0xb3,0xb4,0xb5
+INVOKEVIRTUAL,INVOKESPECIAL,INVOKESTATIC,INVOKEINTERFACE=0xb6,0xb7,0xb8,0xb9
+TABLESWITCH,LOOKUPSWITCH,WIDE,IINC=0xaa,0xab,0xc4,0x84
+#length of every fixed size instruction, the switches and wide are computed
+lengths=[1]*256
+for op in (0x10,0x12,0x15,0x16,0x17,0x18,0x19,0x36,0x37,0x38,0x39,0x3a,0xa9,0xbc):
+    lengths[op]=2
+for op in [0x11,0x13,0x14,0x84,0xbb,0xbd,0xc0,0xc1,0xc6,0xc7]+list(range(0x99,0xa9))+list(range(0xb2,0xb9)):
+    lengths[op]=3
+lengths[0xc5]=4
+for op in (0xb9,0xba,0xc8,0xc9):
+    lengths[op]=5
+
+
+class ClassFile(object):
+    """
+    Just enough of a class file parser: constants, hierarchy, fields and methods with their code
+    """
+    def __init__(self,data):
+        self.data=data
+        if unpack_from(">I",data,0)[0]!=0xCAFEBABE:
+            raise ValueError("Not a class file")
+        count=unpack_from(">H",data,8)[0]
+        #pool[i]=(tag, value) where value is raw for the references
+        self.pool=[None]*count
+        pos=10
+        i=1
+        while i<count:
+            tag=data[pos]
+            if tag==UTF8:
+                length=unpack_from(">H",data,pos+1)[0]
+                self.pool[i]=(tag,data[pos+3:pos+3+length].decode("utf-8",errors="replace"))
+                pos+=3+length
+            else:
+                raw=data[pos+1:pos+1+sizes[tag]]
+                if tag==INTEGER:
+                    value=unpack_from(">i",raw)[0]
+                elif tag==FLOAT:
+                    value=unpack_from(">f",raw)[0]
+                elif tag==LONG:
+                    value=unpack_from(">q",raw)[0]
+                elif tag==DOUBLE:
+                    value=unpack_from(">d",raw)[0]
+                elif sizes[tag]==2:
+                    value=unpack_from(">H",raw)[0]
+                elif tag==METHODHANDLE:
+                    value=(raw[0],unpack_from(">H",raw,1)[0])
+                else:
+                    value=unpack_from(">HH",raw)
+                self.pool[i]=(tag,value)
+                pos+=1+sizes[tag]
+            #longs and doubles take two slots
+            i+=2 if tag in (LONG,DOUBLE) else 1
+        self.access,thisClass,superClass,interfaces=unpack_from(">HHHH",data,pos)
+        self.name=self.className(thisClass)
+        self.superName=self.className(superClass) if superClass else None
+        pos+=8
+        self.interfaces=[self.className(unpack_from(">H",data,pos+2*k)[0]) for k in range(interfaces)]
+        pos+=2*interfaces
+        self.fields,pos=self.members(pos)
+        self.methods,pos=self.members(pos)
+
+    def utf8(self,index):
+        return self.pool[index][1]
+
+    def className(self,index):
+        return self.utf8(self.pool[index][1])
+
+    def ref(self,index):
+        """(owner, name, descriptor) of a field or method reference"""
+        owner,nameAndType=self.pool[index][1]
+        name,descriptor=self.pool[nameAndType][1]
+        return self.className(owner),self.utf8(name),self.utf8(descriptor)
+
+    def members(self,pos):
+        """Fields or methods as (access, name, descriptor, code or None)"""
+        count=unpack_from(">H",self.data,pos)[0]
+        pos+=2
+        found=[]
+        for _ in range(count):
+            access,name,descriptor,attributes=unpack_from(">HHHH",self.data,pos)
+            pos+=8
+            code=None
+            for _ in range(attributes):
+                attributeName,length=unpack_from(">HI",self.data,pos)
+                if self.utf8(attributeName)=="Code":
+                    codeLength=unpack_from(">I",self.data,pos+10)[0]
+                    code=self.data[pos+14:pos+14+codeLength]
+                pos+=6+length
+            found.append((access,self.utf8(name),self.utf8(descriptor),code))
+        return found,pos
+
+    def strings(self):
+        return [self.utf8(c[1]) for c in self.pool if c and c[0]==STRING]
+
+    def numbers(self):
+        return [c[1] for c in self.pool if c and c[0] in (INTEGER,LONG,FLOAT,DOUBLE)]
+
+
+def instructions(code):
+    """(offset, opcode) of every instruction of a method"""
+    pc=0
+    while pc<len(code):
+        op=code[pc]
+        yield pc,op
+        if op==TABLESWITCH or op==LOOKUPSWITCH:
+            #the operands are aligned on 4 bytes
+            start=pc+1+(3-pc)%4
+            if op==TABLESWITCH:
+                low,high=unpack_from(">ii",code,start+4)
+                pc=start+12+4*(high-low+1)
+            else:
+                pairs=unpack_from(">i",code,start+4)[0]
+                pc=start+8+8*pairs
+        elif op==WIDE:
+            pc+=6 if code[pc+1]==IINC else 4
+        else:
+            pc+=lengths[op]
+
+
+def readJar(jar,outer=True):
+    """{class name: ClassFile} of a jar, only the outer classes by default"""
+    classes={}
+    with zipfile.ZipFile(jar) as z:
+        for n in z.namelist():
+            if n.endswith(".class") and not (outer and "$" in n):
+                try:
+                    classes[n[:-6]]=ClassFile(z.read(n))
+                except (ValueError,IndexError,KeyError,struct.error) as e:
+                    print("Could not parse {}: {}".format(n,e))
+    return classes
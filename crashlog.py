@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+import decompiler,jvm,gzip,time,sys,re
+
+#bytes of whole lines handed to a worker at once
+chunkSize=4*1024*1024
+#stack frames "at cjm.a(SourceFile:12)", the class may carry inner classes "cjm$1"
+frame=re.compile(rb"(\bat\s+)(\w+)((?:\$[\w$]*)?\.[\w$<>]+\()")
+#the exception of a trace "cjm: message", "Caused by: cjm$1" or "Exception in thread "main" cjm: message"
+header=re.compile(rb'^([ \t]*(?:Caused by: |Suppressed: |Exception in thread "[^"\n]*" )?)(\w+)((?:\$[\w$]*)?)(?=:|\r?$)',re.M)
+
+#{obfuscated: deobfuscated dotted name} as bytes, set in every worker
+table={}
+
+
+def setup(mapping):
+    global table
+    table={o.encode():d.replace("/",".").encode() for o,d in mapping.items()}
+
+
+def rename(match):
+    return match.group(1)+table.get(match.group(2),match.group(2))+match.group(3)
+
+
+def translate(chunk):
+    """Deobfuscate the stack traces of some lines, each regex finds its lines in one pass over the bytes"""
+    return header.sub(rename,frame.sub(rename,chunk))
+
+
+def chunks(stream):
+    """Pieces of about chunkSize bytes, always cut at the end of a line"""
+    rest=b""
+    while True:
+        data=stream.read(chunkSize)
+        if not data:
+            if rest:
+                yield rest
+            return
+        data=rest+data
+        cut=data.rfind(b"\n")+1
+        if cut==0:
+            rest=data
+            continue
+        rest=data[cut:]
+        yield data[:cut]
+
+
+def openInput(path):
+    if path=="-":
+        return sys.stdin.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path,"rb")
+    return open(path,"rb")
+
+
+def deobfuscate(source,destination,mapping,workers=None):
+    """
+    Deobfuscate a log or crash report archive chunk by chunk over several processes,
+    at most two chunks per worker are in memory at once
+    :return: the bytes processed
+    """
+    workers=workers or jvm.availableCpus()
+    total=0
+    with ProcessPoolExecutor(workers,initializer=setup,initargs=(mapping,)) as pool:
+        pending=[]
+        for chunk in chunks(source):
+            total+=len(chunk)
+            pending.append(pool.submit(translate,chunk))
+            if len(pending)>=2*workers:
+                destination.write(pending.pop(0).result())
+        for future in pending:
+            destination.write(future.result())
+    return total
+
+
+if __name__=="__main__":
+    #python crashlog.py input.log|input.log.gz|- [output]
+    if len(sys.argv)<2:
+        print("Usage: python crashlog.py input.log|input.log.gz|- [output]")
+        sys.exit()
+    mapping=decompiler.currentMappings()
+    if mapping is None:
+        print("Missing files mappings: obf and deobf")
+        sys.exit()
+    t=time.time()
+    source=openInput(sys.argv[1])
+    destination=open(sys.argv[2],"wb") if len(sys.argv)>2 else sys.stdout.buffer
+    size=deobfuscate(source,destination,mapping)
+    destination.flush()
+    elapsed=time.time()-t
+    print("{:.1f} MB in {:.1f}s, {:.1f} MB/s".format(size/1e6,elapsed,size/1e6/max(elapsed,1e-9)),file=sys.stderr)
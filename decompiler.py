@@ -1,10 +1,39 @@
 from pathlib import Path
-from shutil import copyfile,rmtree
-import JDKcheck,subprocess,random,sys,os
+from shutil import rmtree
+import JDKcheck,backends,cds,delta,jvm,resources,store,fingerprint,profiling,mappingdb,random,sys,os,json
 checkJDK=True
 removeBad=["summary.txt"]
+#seconds after which the classes still failing get a stub instead of more retries, None for no limit
+deadline=None
+#jvms running side by side on this machine, they split its memory and cpus
+workers=1
+#which backend produced each class of the last run
+ledgerFile=Path("./backendLedger.json")
+#assets, data packs and lang files are pulled from the jar straight into there
+resourcesDir="resources/"
+#only extract the resources, no decompilation (or pass --resources-only)
+onlyResources=False
+#place the sources through the blob store so identical files of several versions share the disk (see store.py)
+useStore=True
+#file in the tree holding the mappings it was built with
+mappingsSnapshot=".mappings"
+#folder of the mappings to apply, picked from versions.json when the jar is known
+mappingsDir=Path("./filesMappings")
+#version to read from mappings.db when it has it, the files of mappingsDir are used otherwise
+mappingsVersion="1.13.1"
+#launch cfr with a class-data sharing archive of its classes, built on the first run (see cds.py)
+useCDS=True
 import time
 
+def writeFile(data,destination):
+    """Write a source of the tree, through the store if enabled"""
+    if useStore:
+        store.place(data,destination)
+    else:
+        with destination.open(mode="wb") as fid:
+            fid.write(data)
+
+@profiling.profiled("copydir")
 def copydir(source, dest):
     """Copy a directory structure overwriting existing files"""
     for root, dirs, files in os.walk(source):
@@ -17,8 +46,9 @@ def copydir(source, dest):
             if not os.path.isdir(dest_path):
                 os.makedirs(dest_path)
             dest_path=os.path.join(dest_path, each_file)
-            copyfile(os.path.join(root, each_file), dest_path)
+            writeFile(Path(root, each_file).read_bytes(), Path(dest_path))
 
+@profiling.profiled("findjar")
 def findjar():
     path=Path("./1.13.1.jar")
     if not path.exists():
@@ -30,21 +60,41 @@ def findjar():
         path=path.resolve()
     return path
 
-def decompileJar():
-    path=findjar()
+def findServerJar():
+    for path in (Path("./1.13.1-server.jar"),Path("./server.jar"),Path("./minecraft_server.1.13.1.jar")):
+        if path.exists():
+            return path.resolve()
+    print("No server Jar found")
+    return None
+
+@profiling.profiled("decompileJar")
+def decompileJar(path=None,temp="./temp",resourcesTo=None,ledgerTo=None):
+    path=path or findjar()
+    resourcesTo=resourcesTo or resourcesDir
     if path:
-        cfr=Path("./lib/cfr_0_132.jar")
-        if cfr.exists():
-            cfr=cfr.resolve()
+        engines=backends.findBackends(Path("./lib"))
+        if engines:
             #ok that part isnt necessary but i want cfr to work
             if checkJDK:
-                path_to_jdk=Path(JDKcheck.main())
+                with profiling.stage("JDKcheck.main"):
+                    path_to_jdk=Path(JDKcheck.main())
                 if not path_to_jdk.exists():
                     path_to_jdk=None
                     print("Path to JDK is wrong af, put checkJDK=False in the import and relaunch if you are sure.")
                 else:
                     path_to_jdk=path_to_jdk.resolve()
-            subprocess.run(["java","-jar",cfr.__str__(),path.__str__(),"--outputdir","./temp","--caseinsensitivefs","true"],shell=True)
+            if useCDS:
+                with profiling.stage("CDS archive"):
+                    cds.attach(engines,path,path_to_jdk if checkJDK else None)
+            profile=jvm.pick(workers)
+            backends.jvmFlags=jvm.flags(profile,path,workers)
+            print("JVM profile {}: {}".format(profile," ".join(backends.jvmFlags)))
+            extraction=resources.extractInBackground(path,resourcesTo)
+            ledger=backends.decompile(path,temp,engines,deadline)
+            if ledger is None:
+                return False
+            Path(ledgerTo or ledgerFile).write_text(json.dumps(ledger,indent=1,sort_keys=True))
+            print("{} resources extracted in {}".format(extraction.result(),resourcesTo))
             return True
         else:
             print("Missing a library: CFR")
@@ -52,71 +102,108 @@ def decompileJar():
         print("Missing a jar: 1.13.1.jar")
     return False
 
-def applyFileMappings():
-    obf=Path("./filesMappings/classes-obf.txt")
-    deobf=Path("./filesMappings/classes-deobf.txt")
+def completeRun(ledger=None):
+    """Whether the last decompilation got every class, no stub and no failed output kept"""
+    path=Path(ledger or ledgerFile)
+    if not path.exists():
+        return False
+    return all(v!="failed" and not v.endswith("(failed)") for v in json.loads(path.read_text()).values())
+
+def extractResources():
+    path=findjar()
+    if path:
+        print("{} resources extracted in {}".format(resources.extract(path,resourcesDir),resourcesDir))
+        return True
+    print("Missing a jar: 1.13.1.jar")
+    return False
+
+def loadMappings(obf,deobf):
+    """Mapping dictionary {obfuscated: deobfuscated} of the outer classes"""
     mapping={}
+    with open(deobf) as d,open(obf) as o:
+        for e,el in zip(d,o):
+            if "$" not in el:
+                mapping[el.strip("\n")]=e.strip("\n")
+    return mapping
+
+def saveSnapshot(mapping,src):
+    """Remember in the tree the mappings it was built with, remap.py diffs against it"""
+    with Path(src).joinpath(mappingsSnapshot).open("w") as fid:
+        for nameObf in sorted(mapping):
+            fid.write("{} {}\n".format(nameObf,mapping[nameObf]))
+
+def placeFile(file,src,mapping,nameObf=None):
+    """Write a decompiled file at its deobfuscated place in src, src/wtf/ if the mappings don't know it"""
+    nameObf=nameObf or (file.stem if file.suffix==".java" else None)
+    nameDeObf=mapping[nameObf] if nameObf in mapping else None
+    if nameDeObf:
+        destination=Path(src).joinpath(nameDeObf+".java")
+    elif nameObf and "/" in nameObf:
+        #the few classes in packages were never obfuscated
+        destination=Path(src).joinpath(nameObf+".java")
+    else:
+        print("I found one bad file: {}, it will be added at {}/wtf/".format(file.__str__(),Path(src).as_posix().rstrip("/")))
+        destination=Path(src).joinpath("wtf").joinpath(file.name)
+    destination.parent.mkdir(parents=True,exist_ok=True)
+    writeFile(file.read_bytes(),destination)
+
+@profiling.profiled("mapping load")
+def currentMappings():
+    """Mappings to apply, from mappings.db if it knows the version, None if there are none"""
+    if mappingsVersion and mappingdb.has(mappingsVersion):
+        return mappingdb.load(mappingsVersion)
+    obf=mappingsDir.joinpath("classes-obf.txt")
+    deobf=mappingsDir.joinpath("classes-deobf.txt")
     if obf.exists() and deobf.exists():
+        return loadMappings(obf,deobf)
+
+def applyFileMappings(stamp=None,temp="./temp",src=None):
+    #create the mapping dictionary for later application
+    mapping=currentMappings()
+    if mapping is not None:
 
-        #create the mapping dictionary for later application
-        with open(deobf) as d,open(obf) as o:
-            for e,el in zip(d,o):
-                if "$" not in el:
-                    mapping[el.strip("\n")]=e.strip("\n")
-
-        #create the root node of the Tree
-        src="src/"
-        try:
-            Path(src).mkdir()
-        except FileExistsError:
-            print("I saw you already have a src, you might not want to change things in it, shall we create a new src directory? y/n ")
-            resp=input()
-            if resp.lower() in ["y","yes","ofc","yeah","yea","ye","yep","alright"]:
-                src="src"+str(random.getrandbits(128))+"/"
+        #create the root node of the Tree, a given src is used as is without asking
+        if src:
+            Path(src).mkdir(parents=True,exist_ok=True)
+            src=Path(src).as_posix()+"/"
+        else:
+            src="src/"
+            try:
                 Path(src).mkdir()
-            else:
-                print("Shall i overwrite everything? y/n")
-                resp = input()
-                if resp.lower() not in ["y", "yes", "ofc", "yeah", "yea", "ye", "yep", "alright"]:
-                    sys.exit()
+            except FileExistsError:
+                print("I saw you already have a src, you might not want to change things in it, shall we create a new src directory? y/n ")
+                resp=input()
+                if resp.lower() in ["y","yes","ofc","yeah","yea","ye","yep","alright"]:
+                    src="src"+str(random.getrandbits(128))+"/"
+                    Path(src).mkdir()
+                else:
+                    print("Shall i overwrite everything? y/n")
+                    resp = input()
+                    if resp.lower() not in ["y", "yes", "ofc", "yeah", "yea", "ye", "yep", "alright"]:
+                        sys.exit()
 
         #Apply the mappings and create the file Tree
 
-        path_to_temp = Path("./temp")
+        path_to_temp = Path(temp)
         #remove some file generated by cfr
         for el in removeBad:
             if path_to_temp.joinpath(el).exists():
                 path_to_temp.joinpath(el).unlink()
 
-        for file in path_to_temp.iterdir():
-            if file.is_file():
-                nameObf=file.__str__().split("\\")[1].split(".")[0] if file.__str__().split("\\")[1].split(".")[1]=="java" else None
-                nameDeObf=mapping[nameObf] if  nameObf in mapping else None
-                if nameDeObf:
-                    route="/".join(nameDeObf.split("/")[:-1])
-                    try:
-                        Path(src).joinpath(route).mkdir(parents=True)
-                    except FileExistsError:
-                        pass
-                    destination=Path(src).joinpath(nameDeObf+".java")
-                else:
-                    print("I found one bad file: {}, it will be added at src/wtf/".format(file.__str__()))
-                    try:
-                        Path(src).joinpath("wtf").mkdir()
-                    except FileExistsError:
-                        pass
-                    destination=Path(src).joinpath("wtf").joinpath(file.__str__().split("\\")[1])
-                source = Path(file)
-                if destination.exists():
-                    mode='wb'
+        with profiling.stage("placement"):
+            for file in path_to_temp.iterdir():
+                if file.is_file():
+                    placeFile(file,src,mapping)
                 else:
-                    mode="xb"
-                with destination.open(mode=mode) as fid:
-                    fid.write(source.read_bytes())
-            else:
 
-                copydir(file.__str__(),src.strip("/")+"\\net")
-        rmtree("temp/")
+                    copydir(file.__str__(),Path(src).joinpath(file.name).__str__())
+        saveSnapshot(mapping,src)
+        if stamp:
+            fingerprint.save(src,stamp)
+        #what the tree holds, for the delta bundles of the mirrors (see delta.py)
+        with profiling.stage("manifest"):
+            delta.save(src)
+        rmtree(path_to_temp.__str__())
     else:
         print("Missing files mappings: obf and deobf")
 
@@ -124,10 +211,34 @@ def applyFileMappings():
 
 if __name__=="__main__":
     t=time.time()
+    #python decompiler.py --profile writes per stage profiles in /profile
+    profiling.enabled="--profile" in sys.argv
+    if onlyResources or "--resources-only" in sys.argv:
+        extractResources()
+        print("Done in {}".format(time.time()-t))
+        sys.exit()
+    build=None
+    path=findjar()
+    if path:
+        known=fingerprint.lookup(path)
+        if known:
+            print("This is {}, using the mappings in {}".format(*known))
+            mappingsVersion,mappingsDir=known
+        mapping=currentMappings()
+        if mapping is not None:
+            build=fingerprint.stamp(path,mapping,backends.signature(backends.findBackends(Path("./lib"))))
+            if fingerprint.upToDate("src/",build):
+                print("src/ already holds this jar with these mappings and options, nothing to do ({:.3f}s)".format(time.time()-t))
+                sys.exit()
     print("Starting, might take a few seconds to minutes, depends of your potato")
     decompileJar()
+    if build and not completeRun():
+        #a stamp would make the next run skip the classes that failed or that the deadline cut
+        print("Some classes failed or got a stub, src/ is not stamped so the next run does them again")
+        build=None
     print("Decompilation completed, starting the file renaming")
-    applyFileMappings()
+    applyFileMappings(build)
+    profiling.finish()
     print("File Renaming, starting the class name renaming (wip for now)")
     print("Done in {}".format(time.time()-t))
-    print("Your files will be in /src")
+    print("Your files will be in /src and the assets in /{}".format(resourcesDir.strip("/")))
@@ -0,0 +1,144 @@
+from pathlib import Path
+import zipfile,hashlib,json,time,sys,os
+
+#file in a tree listing the hash and size of every other file of it
+manifestFile=".manifest"
+#what a bundle says about itself, the changed files are next to it under files/
+bundleIndex="delta.json"
+
+
+def files(src):
+    """Paths of the tree relative to src, everything but the manifest"""
+    for folder,dirs,names in os.walk(src):
+        for name in names:
+            path=Path(folder,name)
+            relative=path.relative_to(src).as_posix()
+            if relative!=manifestFile:
+                yield relative,path
+
+
+def manifest(src):
+    """{path: [sha256, size]} of the files of a tree"""
+    entries={}
+    for relative,path in files(src):
+        data=path.read_bytes()
+        entries[relative]=[hashlib.sha256(data).hexdigest(),len(data)]
+    return entries
+
+
+def manifestId(entries):
+    return hashlib.sha256(json.dumps(entries,sort_keys=True).encode()).hexdigest()
+
+
+def save(src):
+    """Write the manifest of a tree in it"""
+    entries=manifest(src)
+    Path(src).joinpath(manifestFile).write_text(json.dumps(entries,indent=0,sort_keys=True))
+    return entries
+
+
+def load(path):
+    """Manifest of a tree or a manifest file, empty if there is none"""
+    path=Path(path)
+    if path.is_dir():
+        path=path.joinpath(manifestFile)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def diff(old,new):
+    """(added, changed, removed) paths from one manifest to another"""
+    added=sorted(p for p in new if p not in old)
+    changed=sorted(p for p in new if p in old and old[p][0]!=new[p][0])
+    removed=sorted(p for p in old if p not in new)
+    return added,changed,removed
+
+
+def bundle(old,src,out):
+    """
+    Zip what a tree holding the old manifest needs to become src: the added and changed files
+    and the list of removed ones
+    :return: (added, changed, removed) file counts
+    """
+    #the manifest in src may predate edits, the bundle must carry the hashes of what it ships
+    old,new=load(old),save(src)
+    added,changed,removed=diff(old,new)
+    with zipfile.ZipFile(out,"w",zipfile.ZIP_DEFLATED) as z:
+        z.writestr(bundleIndex,json.dumps({"from":manifestId(old),"to":manifestId(new),"removed":removed,"manifest":new}))
+        for relative in added+changed:
+            z.write(Path(src).joinpath(relative).__str__(),"files/"+relative)
+    return len(added),len(changed),len(removed)
+
+
+def inside(mirror,relative):
+    """Where a path of a bundle lands in the mirror, refusing the ones that would land outside of it"""
+    parts=relative.replace("\\","/").split("/")
+    if not relative or relative.startswith(("/","\\")) or ":" in parts[0] or ".." in parts:
+        raise ValueError("{} is not a path inside the tree".format(relative))
+    return mirror.joinpath(*parts)
+
+
+def apply(path,mirror,force=False):
+    """
+    Bring a mirror to the tree a bundle was made from, it must hold the tree the bundle was
+    made against unless force
+    :return: (written, removed) file counts
+    """
+    mirror=Path(mirror)
+    with zipfile.ZipFile(path) as z:
+        index=json.loads(z.read(bundleIndex))
+        current=load(mirror)
+        if manifestId(current)==index["to"]:
+            return 0,0
+        if manifestId(current)!=index["from"] and not force:
+            raise ValueError("{} is not the tree this bundle was made against".format(mirror))
+        new=index["manifest"]
+        names=[n for n in z.namelist() if n.startswith("files/")]
+        #checked before anything is written so a bad bundle leaves the mirror alone
+        for relative in [n[len("files/"):] for n in names]+index["removed"]+list(new):
+            inside(mirror,relative)
+        written=0
+        for name in names:
+            relative=name[len("files/"):]
+            data=z.read(name)
+            if relative not in new or hashlib.sha256(data).hexdigest()!=new[relative][0]:
+                raise ValueError("{} is corrupted in the bundle".format(relative))
+            destination=inside(mirror,relative)
+            destination.parent.mkdir(parents=True,exist_ok=True)
+            #write then rename so a mirror being read never shows a half written file
+            temp=destination.with_name(destination.name+".part")
+            temp.write_bytes(data)
+            os.replace(temp.__str__(),destination.__str__())
+            written+=1
+    for relative in index["removed"]:
+        destination=inside(mirror,relative)
+        if destination.exists():
+            destination.unlink()
+        #drop the folders left empty
+        for parent in destination.parents:
+            if parent==mirror or not parent.exists() or any(parent.iterdir()):
+                break
+            parent.rmdir()
+    mirror.joinpath(manifestFile).write_text(json.dumps(new,indent=0,sort_keys=True))
+    return written,len(index["removed"])
+
+
+if __name__=="__main__":
+    #python delta.py manifest [src] | python delta.py bundle old.manifest|old-tree src bundle.zip | python delta.py apply bundle.zip mirror [--force]
+    t=time.time()
+    if len(sys.argv) in (2,3) and sys.argv[1]=="manifest":
+        src=sys.argv[2] if len(sys.argv)>2 else "src/"
+        print("{} files listed in {}".format(len(save(src)),Path(src).joinpath(manifestFile)))
+    elif len(sys.argv)==5 and sys.argv[1]=="bundle":
+        added,changed,removed=bundle(sys.argv[2],sys.argv[3],sys.argv[4])
+        print("{}: {} added, {} changed, {} removed, {} bytes in {:.1f}s".format(
+            sys.argv[4],added,changed,removed,os.path.getsize(sys.argv[4]),time.time()-t))
+    elif len(sys.argv) in (4,5) and sys.argv[1]=="apply":
+        try:
+            written,removed=apply(sys.argv[2],sys.argv[3],"--force" in sys.argv)
+            print("{}: {} files written, {} removed in {:.1f}s".format(sys.argv[3],written,removed,time.time()-t))
+        except ValueError as e:
+            print(e)
+    else:
+        print("Usage: python delta.py manifest [src] | python delta.py bundle old.manifest|old-tree src bundle.zip | python delta.py apply bundle.zip mirror [--force]")
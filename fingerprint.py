@@ -0,0 +1,75 @@
+from pathlib import Path
+import hashlib,zipfile,json,sys
+
+#{jar fingerprint: {"version": ..., "mappings": folder with classes-obf.txt and classes-deobf.txt}}
+indexFile=Path("./versions.json")
+#file in a tree telling what it was built from
+stampFile=".build"
+
+
+def fingerprint(jar):
+    """
+    Hash of the names, crcs and sizes of the jar entries, only the central directory
+    is read so it costs milliseconds whatever the size of the jar
+    """
+    h=hashlib.sha1()
+    with zipfile.ZipFile(jar) as z:
+        for info in sorted(z.infolist(),key=lambda i:i.filename):
+            h.update("{} {:08x} {}\n".format(info.filename,info.CRC,info.file_size).encode())
+    return h.hexdigest()
+
+
+def mappingsHash(mapping):
+    """Hash of the mappings themselves, whether they came from mappings.db or the text files"""
+    return hashlib.sha1(json.dumps(mapping,sort_keys=True).encode()).hexdigest()
+
+
+def loadIndex():
+    if indexFile.exists():
+        return json.loads(indexFile.read_text())
+    return {}
+
+
+def lookup(jar):
+    """(version, mappings folder) of a known jar, None if it is not in the index"""
+    known=loadIndex().get(fingerprint(jar))
+    if known:
+        return known["version"],Path(known["mappings"])
+    return None
+
+
+def register(jar,version,mappings):
+    index=loadIndex()
+    index[fingerprint(jar)]={"version":version,"mappings":Path(mappings).as_posix()}
+    indexFile.write_text(json.dumps(index,indent=1,sort_keys=True))
+
+
+def stamp(jar,mapping,options):
+    """What a tree built from this jar, these mappings and these decompiler options looks like"""
+    return {"jar":fingerprint(jar),"mappings":mappingsHash(mapping),"options":options}
+
+
+def upToDate(src,expected):
+    """Whether src already holds the output of exactly these inputs"""
+    built=Path(src).joinpath(stampFile)
+    if not built.exists():
+        return False
+    try:
+        return json.loads(built.read_text())==expected
+    except ValueError:
+        return False
+
+
+def save(src,value):
+    Path(src).joinpath(stampFile).write_text(json.dumps(value,indent=1,sort_keys=True))
+
+
+if __name__=="__main__":
+    #python fingerprint.py jar | python fingerprint.py add jar version mappings_folder
+    if len(sys.argv)==5 and sys.argv[1]=="add":
+        register(sys.argv[2],sys.argv[3],sys.argv[4])
+        print("{} is {}, mappings in {}".format(sys.argv[2],sys.argv[3],sys.argv[4]))
+    elif len(sys.argv)==2:
+        print(fingerprint(sys.argv[1]))
+    else:
+        print("Usage: python fingerprint.py jar | python fingerprint.py add jar version mappings_folder")
@@ -0,0 +1,88 @@
+from pathlib import Path
+import hashlib,subprocess,time,sys,os
+
+branch="refs/heads/versions"
+committer="MCDecompiler <mcdecompiler@localhost>"
+
+
+def blobId(data):
+    """Object id git gives to a file, so we know what it already has without asking it to hash"""
+    return hashlib.sha1(b"blob "+str(len(data)).encode()+b"\0"+data).hexdigest()
+
+
+def previousTree(repo):
+    """{path: blob id} of the last exported version, empty for the first one"""
+    result=subprocess.run(["git","ls-tree","-r","-z",branch],cwd=repo.__str__(),
+                          stdout=subprocess.PIPE,stderr=subprocess.DEVNULL)
+    tree={}
+    if result.returncode==0:
+        for entry in result.stdout.split(b"\0"):
+            if entry:
+                info,path=entry.split(b"\t",1)
+                tree[path.decode()]=info.split()[2].decode()
+    return tree
+
+
+def files(src):
+    """Paths of the tree relative to src, without the bookkeeping files of the decompiler"""
+    for folder,dirs,names in os.walk(src):
+        dirs[:]=[d for d in dirs if not d.startswith(".")]
+        for name in names:
+            if not name.startswith("."):
+                path=Path(folder,name)
+                yield path.relative_to(src).as_posix(),path
+
+
+def export(src,repo,version,message=None):
+    """
+    Commit a decompiled tree as a version in repo through git fast-import, only the changed
+    files are sent and blobs git already has are referenced by id
+    :return: (changed, reused, removed) file counts
+    """
+    repo=Path(repo)
+    if not repo.joinpath(".git").exists() and not repo.joinpath("HEAD").exists():
+        repo.mkdir(parents=True,exist_ok=True)
+        subprocess.run(["git","init","-q"],cwd=repo.__str__(),check=True)
+    previous=previousTree(repo)
+    known=set(previous.values())
+    importer=subprocess.Popen(["git","fast-import","--quiet"],cwd=repo.__str__(),stdin=subprocess.PIPE)
+    out=importer.stdin
+    message=(message or "Minecraft {}".format(version)).encode()
+    out.write("commit {}\nmark :1\ncommitter {} {} +0000\n".format(branch,committer,int(time.time())).encode())
+    out.write(b"data "+str(len(message)).encode()+b"\n"+message+b"\n")
+    if previous:
+        out.write("from {}^0\n".format(branch).encode())
+    changed=reused=0
+    seen=set()
+    for relative,path in files(src):
+        seen.add(relative)
+        data=path.read_bytes()
+        blob=blobId(data)
+        if previous.get(relative)==blob:
+            #unchanged, inherited from the parent commit
+            continue
+        if blob in known:
+            #moved or copied, git has the blob already
+            out.write("M 100644 {} {}\n".format(blob,relative).encode())
+            reused+=1
+        else:
+            out.write("M 100644 inline {}\ndata {}\n".format(relative,len(data)).encode()+data+b"\n")
+            changed+=1
+    removed=[p for p in previous if p not in seen]
+    for relative in removed:
+        out.write("D {}\n".format(relative).encode())
+    out.write("\nreset refs/tags/{}\nfrom :1\n\n".format(version).encode())
+    out.close()
+    if importer.wait():
+        raise RuntimeError("git fast-import failed")
+    return changed,reused,len(removed)
+
+
+if __name__=="__main__":
+    #python history.py repo version [src dir]
+    if len(sys.argv)<3:
+        print("Usage: python history.py repo version [src dir]")
+        sys.exit()
+    t=time.time()
+    changed,reused,removed=export(sys.argv[3] if len(sys.argv)>3 else "src/",sys.argv[1],sys.argv[2])
+    print("{}: {} files changed, {} reused, {} removed in {:.1f}s".format(sys.argv[2],changed,reused,removed,time.time()-t))
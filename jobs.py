@@ -0,0 +1,85 @@
+from pathlib import Path
+from shutil import rmtree
+import backends,decompiler,fingerprint,hashlib,json,time,sys
+
+#every job lives in jobs/<key>/ with its own work dir, its src/, its resources/ and its ledger
+jobsDir=Path("./jobs")
+#decompilations running at the same time on this machine, whoever asks for them
+maxJobs=2
+#seconds between two looks for a free slot
+poll=1
+
+
+def jobKey(jar):
+    """Key of what a job produces: the jar fingerprint, the mappings and the decompiler options"""
+    known=fingerprint.lookup(jar)
+    if known:
+        decompiler.mappingsVersion,decompiler.mappingsDir=known
+    build=fingerprint.stamp(jar,decompiler.currentMappings() or {},backends.signature(backends.findBackends(Path("./lib"))))
+    return hashlib.sha1(json.dumps(build,sort_keys=True).encode()).hexdigest()[:16],build
+
+
+def acquireSlot():
+    """Wait for one of the maxJobs slots of the machine, the open lock file of the slot"""
+    slots=jobsDir.joinpath("slots")
+    slots.mkdir(parents=True,exist_ok=True)
+    while True:
+        for i in range(maxJobs):
+            slot=backends.lockFile(slots.joinpath("{}.lock".format(i)).__str__(),False)
+            if slot:
+                return slot
+        time.sleep(poll)
+
+
+def run(jar):
+    """
+    Decompile a jar as a job, or join the identical job someone else already runs or ran
+    A job with failed classes gives its src dir but is not marked done, the next request runs it again
+    :return: the src dir of the job, None if it failed
+    """
+    jar=Path(jar).resolve()
+    key,build=jobKey(jar)
+    job=jobsDir.joinpath(key)
+    job.mkdir(parents=True,exist_ok=True)
+    done,src=job.joinpath("done"),job.joinpath("src")
+    if done.exists():
+        return src
+    result=None
+    #the system drops the lock of a process that dies, so a dead job never blocks the next one
+    lock=backends.lockFile(job.joinpath("lock").__str__(),False)
+    if not lock:
+        print("Job {} is already running, waiting for it".format(key))
+        lock=backends.lockFile(job.joinpath("lock").__str__())
+    try:
+        #it may have finished while we waited
+        if done.exists():
+            return src
+        slot=acquireSlot()
+        try:
+            work=job.joinpath("work")
+            if work.exists():
+                #left behind by a job that died
+                rmtree(work.__str__())
+            decompiler.workers=maxJobs
+            ledger=job.joinpath("backendLedger.json")
+            if decompiler.decompileJar(jar,work.__str__(),job.joinpath("resources").__str__(),ledger):
+                complete=decompiler.completeRun(ledger)
+                decompiler.applyFileMappings(build if complete else None,work.__str__(),src.__str__())
+                result=src
+                if complete:
+                    done.write_text(json.dumps(build,indent=1))
+                else:
+                    print("Some classes of job {} failed, it stays open".format(key))
+        finally:
+            slot.close()
+    finally:
+        lock.close()
+    return result
+
+
+if __name__=="__main__":
+    #python jobs.py [jar], prints where the sources are
+    path=Path(sys.argv[1]) if len(sys.argv)>1 else decompiler.findjar()
+    if path:
+        result=run(path)
+        print(result.resolve() if result else "Job failed")
@@ -0,0 +1,151 @@
+from pathlib import Path
+from shutil import rmtree
+from struct import unpack_from
+import backends,classfile,decompiler,migrate,jvm,hashlib,zipfile,time
+
+#mappings of the server jar, it is obfuscated on its own so the client ones only fit the shared classes
+serverObf=Path("./filesMappings/server/classes-obf.txt")
+serverDeObf=Path("./filesMappings/server/classes-deobf.txt")
+
+
+#instructions whose operand is a constant pool index, ldc has a one byte one
+LDC=0x12
+poolOperands={0x13,0x14,0xba,0xbb,0xbd,0xc0,0xc1,0xc5}|set(range(classfile.GETSTATIC,classfile.INVOKEINTERFACE+1))
+
+
+def constant(c,index):
+    """Token of a constant that does not depend on the obfuscated names it mentions"""
+    def name(n):
+        return "?" if migrate.obfuscated(n) else n
+
+    def shape(descriptor):
+        return classfile.reference.sub(lambda m:"L"+name(m.group(1))+";",descriptor)
+
+    tag,value=c.pool[index]
+    if tag==classfile.CLASS:
+        return "c:"+shape(c.className(index)) if c.className(index).startswith("[") else "c:"+name(c.className(index))
+    if tag==classfile.STRING:
+        return "s:"+c.utf8(value)
+    if tag in (classfile.FIELDREF,classfile.METHODREF,classfile.INTERFACEMETHODREF):
+        owner,member,descriptor=c.ref(index)
+        #members of obfuscated classes are obfuscated too
+        return "r:{}.{}{}".format(name(owner),"?" if migrate.obfuscated(owner) else member,shape(descriptor))
+    if tag==classfile.INVOKEDYNAMIC:
+        return "d:"+shape(c.utf8(c.pool[value[1]][1][1]))
+    if tag in (classfile.INTEGER,classfile.FLOAT,classfile.LONG,classfile.DOUBLE):
+        return "k:"+repr(value)
+    return "t:{}".format(tag)
+
+
+def codeHash(c,code):
+    """Hash of a method body with its constant pool operands replaced by their tokens"""
+    h=hashlib.sha1()
+    offsets=[pc for pc,_ in classfile.instructions(code)]+[len(code)]
+    for pc,end in zip(offsets,offsets[1:]):
+        op=code[pc]
+        if op==LDC:
+            h.update(bytes([op])+constant(c,code[pc+1]).encode()+b"\0")
+        elif op in poolOperands:
+            h.update(bytes([op])+constant(c,unpack_from(">H",code,pc+1)[0]).encode()+b"\0"+code[pc+3:end])
+        else:
+            h.update(code[pc:end])
+    return h.hexdigest()
+
+
+def classHash(c):
+    """Features of the class (see migrate.features) and the bodies of its methods, without the obfuscated names"""
+    tokens=sorted(migrate.features(c,{}))
+    tokens+=sorted("b:"+codeHash(c,code) for _,_,_,code in c.methods if code is not None)
+    return hashlib.sha1("\n".join(tokens).encode()).digest()
+
+
+def classHashes(jar):
+    """
+    {outer class: hash of its bytecode and the one of its inner classes}, obfuscated names are
+    left out since each jar is obfuscated on its own
+    """
+    hashes={}
+    for name,c in classfile.readJar(jar,False).items():
+        hashes.setdefault(name.split("$")[0],[]).append(classHash(c))
+    return {outer:hashlib.sha1(b"".join(sorted(inner))).digest() for outer,inner in hashes.items()}
+
+
+def packages(jar):
+    with zipfile.ZipFile(jar) as z:
+        return {n.rpartition("/")[0] for n in z.namelist() if n.endswith(".class")}
+
+
+def groups(hashes):
+    """{hash: sorted classes having it}"""
+    found={}
+    for name,h in hashes.items():
+        found.setdefault(h,[]).append(name)
+    return {h:sorted(names) for h,names in found.items()}
+
+
+def split(client,server):
+    """
+    (common, client only, server only) classes, common ones have the same bytecode on both sides
+    and are named as in the client, server only ones leave out the libraries the server bundles
+    """
+    clientHashes,serverHashes=classHashes(client),classHashes(server)
+    clientGroups,serverGroups=groups(clientHashes),groups(serverHashes)
+    pairs={}
+    for h,names in clientGroups.items():
+        #classes with the same hash only differ by names, any pairing of them decompiles the same
+        if len(serverGroups.get(h,()))==len(names):
+            pairs.update(zip(names,serverGroups[h]))
+    matched=set(pairs.values())
+    #netty, fastutil, gson...: packages the client jar does not have
+    clientPackages=packages(client)
+    serverOnly=sorted(n for n in serverHashes if n not in matched and n.rpartition("/")[0] in clientPackages)
+    return sorted(pairs),sorted(n for n in clientHashes if n not in pairs),serverOnly
+
+
+def place(temp,root,names,mapping):
+    for nameObf in names:
+        file=Path(temp).joinpath(nameObf+".java")
+        if file.exists():
+            decompiler.placeFile(file,root,mapping,nameObf)
+    Path(root).mkdir(parents=True,exist_ok=True)
+    decompiler.saveSnapshot(mapping,root)
+
+
+def decompileBoth(client,server,out="."):
+    """
+    Decompile the client and the server jars, every class shared by both only once,
+    into out/client/, out/server/ and out/common/, the libraries bundled in the server are skipped
+    """
+    common,clientOnly,serverOnly=split(client,server)
+    print("{} shared classes, {} client only, {} server only".format(len(common),len(clientOnly),len(serverOnly)))
+    engines=backends.findBackends(Path("./lib"))
+    if not engines:
+        print("Missing a library: CFR")
+        return False
+    backends.jvmFlags=jvm.flags(jvm.pick(),client)
+    temp=Path(out).joinpath("temp")
+    #the client jar holds every shared class, so it is decompiled whole and the server only for what it adds
+    if backends.decompile(client,temp.joinpath("client"),engines,decompiler.deadline) is None:
+        return False
+    if serverOnly and backends.decompile(server,temp.joinpath("server"),engines,decompiler.deadline,serverOnly) is None:
+        return False
+    mapping=decompiler.loadMappings(Path("./filesMappings/classes-obf.txt"),Path("./filesMappings/classes-deobf.txt"))
+    serverMapping={}
+    if serverObf.exists() and serverDeObf.exists():
+        serverMapping=decompiler.loadMappings(serverObf,serverDeObf)
+    else:
+        print("No server mappings in {}, the server only classes stay obfuscated".format(serverObf.parent))
+    place(temp.joinpath("client"),Path(out).joinpath("common"),common,mapping)
+    place(temp.joinpath("client"),Path(out).joinpath("client"),clientOnly,mapping)
+    place(temp.joinpath("server"),Path(out).joinpath("server"),serverOnly,serverMapping)
+    rmtree(temp.__str__())
+    return True
+
+
+if __name__=="__main__":
+    t=time.time()
+    client,server=decompiler.findjar(),decompiler.findServerJar()
+    if client and server:
+        decompileBoth(client,server)
+        print("Done in {}".format(time.time()-t))
+        print("Your files will be in /client, /server and /common")
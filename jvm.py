@@ -0,0 +1,156 @@
+from pathlib import Path
+import backends,tempfile,zipfile,json,time,sys,os
+
+calibrationFile=Path("./jvmCalibration.json")
+#gc and share of the memory of a worker given to the heap
+profiles={
+    "serial":{"gc":"-XX:+UseSerialGC","heap":0.5},
+    "parallel":{"gc":"-XX:+UseParallelGC","heap":0.75},
+    "g1":{"gc":"-XX:+UseG1GC","heap":0.75},
+}
+MB=1024*1024
+
+
+def readInt(path):
+    try:
+        value=Path(path).read_text().split()[0]
+    except (OSError,IndexError):
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def availableMemory():
+    """Bytes we may use, the container limit if we are in one"""
+    limits=[]
+    #cgroup v2 then v1, v1 says some absurd number when there is no limit
+    for limit in ("/sys/fs/cgroup/memory.max","/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value=readInt(limit)
+        if value and value<1<<60:
+            limits.append(value)
+    try:
+        with open("/proc/meminfo") as m:
+            for line in m:
+                if line.startswith("MemAvailable:"):
+                    limits.append(int(line.split()[1])*1024)
+    except OSError:
+        pass
+    if not limits and sys.platform=="win32":
+        import ctypes
+        class MemoryStatus(ctypes.Structure):
+            _fields_=[("dwLength",ctypes.c_ulong),("dwMemoryLoad",ctypes.c_ulong),
+                      ("ullTotalPhys",ctypes.c_ulonglong),("ullAvailPhys",ctypes.c_ulonglong),
+                      ("ullTotalPageFile",ctypes.c_ulonglong),("ullAvailPageFile",ctypes.c_ulonglong),
+                      ("ullTotalVirtual",ctypes.c_ulonglong),("ullAvailVirtual",ctypes.c_ulonglong),
+                      ("sullAvailExtendedVirtual",ctypes.c_ulonglong)]
+        status=MemoryStatus()
+        status.dwLength=ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            limits.append(status.ullAvailPhys)
+    #no idea, assume a potato with 2g
+    return min(limits) if limits else 2048*MB
+
+
+def availableCpus():
+    """Cpus we may use, the container quota if we are in one"""
+    try:
+        cpus=len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus=os.cpu_count() or 1
+    try:
+        quota,period=Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota!="max":
+            cpus=min(cpus,max(1,int(quota)//int(period)))
+    except (OSError,ValueError):
+        quota,period=readInt("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"),readInt("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if quota and period:
+            cpus=min(cpus,max(1,quota//period))
+    return cpus
+
+
+def loadCalibration(path=calibrationFile):
+    if path and Path(path).exists():
+        try:
+            return json.loads(Path(path).read_text())
+        except ValueError:
+            print("JVM calibration is corrupted, ignoring it")
+    return {}
+
+
+def pick(workers=1,calibration=calibrationFile):
+    """
+    Profile for this machine, the calibrated one if any, else a guess from memory and cpus
+    :param calibration: file written by calibrate, None to always guess
+    """
+    calibration=loadCalibration(calibration)
+    if calibration.get("best") in profiles and calibration.get("cpus")==availableCpus():
+        return calibration["best"]
+    if availableMemory()//workers<1024*MB or availableCpus()//workers<2:
+        #a parallel gc on a single cpu or a tiny heap is pure overhead
+        return "serial"
+    return "parallel"
+
+
+def flags(profile,jar,workers=1):
+    """
+    JVM flags of a profile for a jar, when workers jvms run side by side
+    :param profile: name in profiles
+    """
+    settings=profiles[profile]
+    share=availableMemory()//workers
+    #cfr holds the whole class hierarchy, it wants about a hundred times the jar
+    need=max(512*MB,100*Path(jar).stat().st_size)
+    heap=max(64*MB,min(int(share*settings["heap"]),need))
+    threads=max(1,availableCpus()//workers)
+    return ["-Xmx{}m".format(heap//MB),settings["gc"],
+            "-XX:ParallelGCThreads={}".format(threads),
+            "-XX:CICompilerCount={}".format(max(2,threads))]
+
+
+def sample(jar,n):
+    """n classes spread evenly over the size range of the jar, so big and small ones are represented"""
+    with zipfile.ZipFile(jar) as z:
+        sizes={}
+        for info in z.infolist():
+            if info.filename.endswith(".class"):
+                name=info.filename[:-6].split("$")[0]
+                sizes[name]=sizes.get(name,0)+info.file_size
+    ranked=sorted(sizes,key=sizes.get)
+    if len(ranked)<=n:
+        return ranked
+    return [ranked[i*len(ranked)//n] for i in range(n)]
+
+
+def calibrate(jar,n=200,workers=1):
+    """Time cfr on a sample of the jar under every profile, remember the fastest"""
+    cfr=[b for b in backends.findBackends() if isinstance(b,backends.CFR)]
+    if not cfr:
+        print("Missing a library: CFR")
+        return None
+    classes=sample(jar,n)
+    saved=backends.jvmFlags
+    results={}
+    try:
+        for profile in profiles:
+            backends.jvmFlags=flags(profile,jar,workers)
+            with tempfile.TemporaryDirectory() as out:
+                t=time.time()
+                backends.run(cfr[0],Path(jar).resolve(),Path(out),classes)
+                elapsed=time.time()-t
+                done=len(classes)-len(backends.collect(cfr[0],Path(out),Path(out),classes,{}))
+            results[profile]=done/elapsed
+            print("{}: {} classes in {:.1f}s, {:.1f} classes/s ({})".format(profile,done,elapsed,results[profile]," ".join(backends.jvmFlags)))
+    finally:
+        backends.jvmFlags=saved
+    best=max(results,key=results.get)
+    calibrationFile.write_text(json.dumps({"best":best,"throughput":results,"cpus":availableCpus(),
+                                           "memory":availableMemory()},indent=1))
+    print("Best profile here: {}".format(best))
+    return best
+
+
+if __name__=="__main__":
+    #python jvm.py path/to/version.jar [sample size]
+    if len(sys.argv)<2:
+        print("Usage: python jvm.py path/to/version.jar [sample size]")
+    else:
+        calibrate(sys.argv[1],int(sys.argv[2]) if len(sys.argv)>2 else 200)
@@ -0,0 +1,87 @@
+from pathlib import Path
+import sqlite3,sys
+
+#every version's mappings in one indexed file
+dbFile=Path("./mappings.db")
+
+schema="""
+create table if not exists versions(id integer primary key,name text unique not null);
+create table if not exists classes(version integer not null references versions(id),obf text not null,deobf text not null);
+create unique index if not exists classesByObf on classes(version,obf);
+create index if not exists classesByDeObf on classes(deobf,version);
+create index if not exists classesByVersionDeObf on classes(version,deobf);
+"""
+
+
+def connect():
+    db=sqlite3.connect(dbFile.__str__())
+    db.executescript(schema)
+    return db
+
+
+def versionId(db,version,create=False):
+    row=db.execute("select id from versions where name=?",(version,)).fetchone()
+    if row:
+        return row[0]
+    if create:
+        return db.execute("insert into versions(name) values (?)",(version,)).lastrowid
+
+
+def importVersion(version,folder):
+    """Load the mapping files of a folder as a version, replacing what the version had, in one transaction"""
+    folder=Path(folder)
+    with open(folder.joinpath("classes-deobf.txt")) as d,open(folder.joinpath("classes-obf.txt")) as o:
+        rows=[(el.strip("\n"),e.strip("\n")) for e,el in zip(d,o)]
+    db=connect()
+    with db:
+        vid=versionId(db,version,True)
+        db.execute("delete from classes where version=?",(vid,))
+        db.executemany("insert or replace into classes(version,obf,deobf) values ({},?,?)".format(vid),rows)
+    db.close()
+    return len(rows)
+
+
+def has(version):
+    if not dbFile.exists():
+        return False
+    db=connect()
+    found=versionId(db,version) is not None
+    db.close()
+    return found
+
+
+def load(version):
+    """Mapping dictionary {obfuscated: deobfuscated} of the outer classes of a version"""
+    db=connect()
+    rows=db.execute("select obf,deobf from classes join versions on versions.id=classes.version "
+                    "where versions.name=? and obf not like '%$%'",(version,)).fetchall()
+    db.close()
+    return dict(rows)
+
+
+def history(nameDeObf):
+    """[(version, obfuscated name)] of a class in every version that has it"""
+    db=connect()
+    rows=db.execute("select versions.name,obf from classes join versions on versions.id=classes.version "
+                    "where deobf=? order by versions.id",(nameDeObf,)).fetchall()
+    db.close()
+    return rows
+
+
+def lookup(version,nameObf):
+    db=connect()
+    row=db.execute("select deobf from classes where version=(select id from versions where name=?) and obf=?",
+                   (version,nameObf)).fetchone()
+    db.close()
+    return row[0] if row else None
+
+
+if __name__=="__main__":
+    #python mappingdb.py import 1.13.1 filesMappings | python mappingdb.py history net/minecraft/crash/CrashReport
+    if len(sys.argv)==4 and sys.argv[1]=="import":
+        print("{} classes imported for {}".format(importVersion(sys.argv[2],sys.argv[3]),sys.argv[2]))
+    elif len(sys.argv)==3 and sys.argv[1]=="history":
+        for version,nameObf in history(sys.argv[2]):
+            print("{}\t{}".format(version,nameObf))
+    else:
+        print("Usage: python mappingdb.py import version folder | python mappingdb.py history deobfuscated/Name")
@@ -0,0 +1,145 @@
+from pathlib import Path
+from collections import Counter
+import classfile,decompiler,hashlib,struct,sys,time
+
+#minhash: rows*bands hash values per class, two classes become candidates when a whole band agrees
+rows=4
+bands=8
+#below this jaccard similarity a match is not worth proposing
+minScore=0.5
+#rounds of matching, each one sees the classes matched by the previous ones under their old name
+passes=2
+
+
+def obfuscated(name):
+    """Obfuscated classes live in the default package, everything else keeps its name between versions"""
+    return "/" not in name
+
+
+def features(c,known):
+    """
+    Set of what survives obfuscation in a class: strings, numbers, shapes of the members and
+    of the hierarchy. Obfuscated names are replaced by their match if known, by ? otherwise.
+    :param known: {name in this jar: name in the old jar}
+    """
+    def name(n):
+        if n is None or not obfuscated(n):
+            return n
+        return known.get(n,"?")
+
+    def shape(descriptor):
+        return classfile.reference.sub(lambda m:"L"+name(m.group(1))+";",descriptor)
+
+    tokens=["s:"+s for s in c.strings()]
+    tokens+=["k:"+repr(n) for n in c.numbers() if not (isinstance(n,int) and -8<n<8)]
+    tokens+=["f:"+shape(f[2]) for f in c.fields]
+    for access,member,descriptor,_ in c.methods:
+        tokens.append("m:"+shape(descriptor))
+        if len(member)>2:
+            #overrides of library methods and constructors keep their name
+            tokens.append("n:"+member+shape(descriptor))
+    tokens+=["x:"+(name(c.superName) or ""),"F#{}".format(len(c.fields)),"M#{}".format(len(c.methods)),
+             "a:{}".format(c.access&(classfile.ACC_INTERFACE|classfile.ACC_ABSTRACT|classfile.ACC_ENUM))]
+    tokens+=["i:"+name(i) for i in c.interfaces]
+    #a multiset: the second "m:()V" is another feature than the first one
+    counts=Counter()
+    unique=set()
+    for token in tokens:
+        counts[token]+=1
+        unique.add(token+"#{}".format(counts[token]))
+    return unique
+
+
+digests={}
+
+
+def hashes(token):
+    """rows*bands 32 bit hash values of a feature, memoized since most features repeat"""
+    found=digests.get(token)
+    if found is None:
+        raw=b"".join(hashlib.blake2b(token.encode(),digest_size=64,salt=bytes([k])*16).digest() for k in range((rows*bands+15)//16))
+        found=digests[token]=struct.unpack_from("<{}I".format(rows*bands),raw)
+    return found
+
+
+def signature(tokens):
+    """Minhash of a feature set, the min of every hash function is taken column wise"""
+    if not tokens:
+        return (0,)*(rows*bands)
+    return tuple(map(min,zip(*(hashes(t) for t in tokens))))
+
+
+def candidates(oldSigs,newSigs):
+    """Pairs sharing at least one band, no all-pairs comparison"""
+    pairs=set()
+    for b in range(bands):
+        buckets={}
+        for name,sig in oldSigs.items():
+            buckets.setdefault(sig[b*rows:(b+1)*rows],[]).append(name)
+        for name,sig in newSigs.items():
+            for old in buckets.get(sig[b*rows:(b+1)*rows],()):
+                pairs.add((old,name))
+    return pairs
+
+
+def match(oldJar,newJar):
+    """
+    Match the obfuscated classes of two versions of the jar
+    :return: {new obfuscated name: (old obfuscated name, confidence)}
+    """
+    old,new=classfile.readJar(oldJar),classfile.readJar(newJar)
+    oldNames=[n for n in old if obfuscated(n)]
+    newNames=[n for n in new if obfuscated(n)]
+    matches={}
+    for step in range(passes):
+        #old classes are known under their own name once matched, new ones under the old name
+        oldKnown={o:o for o,_ in matches.values()}
+        newKnown={n:o for n,(o,_) in matches.items()}
+        oldFeatures={n:features(old[n],oldKnown) for n in oldNames}
+        newFeatures={n:features(new[n],newKnown) for n in newNames}
+        pairs=candidates({n:signature(f) for n,f in oldFeatures.items()},{n:signature(f) for n,f in newFeatures.items()})
+        scored=[]
+        for o,n in pairs:
+            a,b=oldFeatures[o],newFeatures[n]
+            scored.append((len(a&b)/(len(a|b) or 1),o,n))
+        #best pairs first, each class is matched once
+        scored.sort(reverse=True)
+        matches={}
+        taken=set()
+        for score,o,n in scored:
+            if score<minScore:
+                break
+            if n not in matches and o not in taken:
+                matches[n]=(o,score)
+                taken.add(o)
+        print("Pass {}: {} candidate pairs, {} of {} classes matched".format(step+1,len(pairs),len(matches),len(newNames)))
+    return matches
+
+
+def migrate(oldJar,newJar,mapping,out):
+    """Carry the old mappings onto the new obfuscated names, with a confidence per class"""
+    matches=match(oldJar,newJar)
+    out=Path(out)
+    out.mkdir(parents=True,exist_ok=True)
+    carried=sorted((n,mapping[o],score) for n,(o,score) in matches.items() if o in mapping)
+    with open(out.joinpath("classes-obf.txt"),"w") as o,open(out.joinpath("classes-deobf.txt"),"w") as d,\
+         open(out.joinpath("confidence.txt"),"w") as c:
+        for nameObf,nameDeObf,score in carried:
+            o.write(nameObf+"\n")
+            d.write(nameDeObf+"\n")
+            c.write("{:.3f} {} {}\n".format(score,nameObf,nameDeObf))
+    return len(carried)
+
+
+if __name__=="__main__":
+    #python migrate.py old.jar new.jar out_folder
+    if len(sys.argv)!=4:
+        print("Usage: python migrate.py old.jar new.jar out_folder")
+        sys.exit()
+    mapping=decompiler.currentMappings()
+    if mapping is None:
+        print("Missing files mappings: obf and deobf")
+        sys.exit()
+    t=time.time()
+    count=migrate(sys.argv[1],sys.argv[2],mapping,sys.argv[3])
+    print("{} classes carried over in {:.1f}s, see {}/confidence.txt".format(count,time.time()-t,sys.argv[3]))
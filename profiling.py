@@ -0,0 +1,92 @@
+from pathlib import Path
+from contextlib import contextmanager
+from functools import wraps
+import cProfile,tracemalloc,time
+
+#turned on by --profile, every stage is then run under cProfile and tracemalloc
+enabled=False
+outDir=Path("./profile")
+#allocation sites listed per stage
+topAllocations=25
+
+#name: {"profile", "calls", "wall", "external", "peak", "allocations"}
+stages={}
+#profilers of the stages we are in, only the innermost one runs
+running=[]
+
+
+def get(name):
+    return stages.setdefault(name,{"profile":cProfile.Profile(),"calls":0,"wall":0.0,"external":0.0,"peak":0,"allocations":None})
+
+
+@contextmanager
+def stage(name):
+    """
+    Profile a stage of the pipeline, nested stages are taken out of their parent profile
+    but not out of its wall time
+    """
+    if not enabled:
+        yield
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    s=get(name)
+    if running:
+        running[-1]["profile"].disable()
+    before=tracemalloc.take_snapshot()
+    if hasattr(tracemalloc,"reset_peak"):
+        tracemalloc.reset_peak()
+    running.append(s)
+    t=time.time()
+    s["profile"].enable()
+    try:
+        yield
+    finally:
+        s["profile"].disable()
+        s["wall"]+=time.time()-t
+        s["calls"]+=1
+        s["peak"]=max(s["peak"],tracemalloc.get_traced_memory()[1])
+        diff=tracemalloc.take_snapshot().compare_to(before,"lineno")
+        if s["allocations"] is None or sum(d.size_diff for d in diff)>sum(d.size_diff for d in s["allocations"]):
+            #the call that kept the most memory is the interesting one
+            s["allocations"]=diff
+        running.pop()
+        if running:
+            running[-1]["profile"].enable()
+
+
+def profiled(name):
+    """Decorator running a function as a stage"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args,**kwargs):
+            with stage(name):
+                return function(*args,**kwargs)
+        return wrapper
+    return decorator
+
+
+def subprocessTime(seconds):
+    """Time spent waiting on a child process (the jvm), counted apart from the python time of the stage"""
+    if enabled and running:
+        running[-1]["external"]+=seconds
+
+
+def finish():
+    """Write the .pstats and the allocation report of every stage and a summary"""
+    if not enabled:
+        return
+    outDir.mkdir(parents=True,exist_ok=True)
+    lines=["{:<20}{:>8}{:>10}{:>10}{:>10}{:>12}".format("stage","calls","wall s","jvm s","python s","peak MB")]
+    for name,s in stages.items():
+        fileName=name.replace(" ","_")
+        s["profile"].dump_stats(outDir.joinpath(fileName+".pstats").__str__())
+        with open(outDir.joinpath(fileName+"-allocations.txt"),"w") as fid:
+            for stat in (s["allocations"] or [])[:topAllocations]:
+                fid.write("{}\n".format(stat))
+        lines.append("{:<20}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}{:>12.1f}".format(
+            name,s["calls"],s["wall"],s["external"],s["wall"]-s["external"],s["peak"]/1e6))
+    summary="\n".join(lines)
+    outDir.joinpath("summary.txt").write_text(summary+"\n")
+    print(summary)
+    print("Profiles in {}, open them with python -m pstats".format(outDir))
@@ -0,0 +1,89 @@
+from pathlib import Path
+import decompiler,delta,fingerprint,json,sys,os,time
+
+
+def loadSnapshot(src):
+    """Mappings a tree was built with, None if it predates the snapshots"""
+    snapshot=Path(src).joinpath(decompiler.mappingsSnapshot)
+    if not snapshot.exists():
+        return None
+    mapping={}
+    with snapshot.open() as fid:
+        for line in fid:
+            nameObf,nameDeObf=line.rstrip("\n").split(" ",1)
+            mapping[nameObf]=nameDeObf
+    return mapping
+
+
+def location(src,nameObf,nameDeObf):
+    """Where applyFileMappings puts a class"""
+    if nameDeObf:
+        return Path(src).joinpath(nameDeObf+".java")
+    return Path(src).joinpath("wtf",nameObf+".java")
+
+
+def prune(folder,src):
+    """Remove folder and its parents while they are empty, up to src"""
+    src=Path(src).resolve()
+    folder=folder.resolve()
+    while folder!=src and src in folder.parents:
+        try:
+            folder.rmdir()
+        except OSError:
+            return
+        folder=folder.parent
+
+
+def diff(old,new):
+    """{obfuscated: (old name, new name)} of every class whose name changed, None for unmapped"""
+    return {n:(old.get(n),new.get(n)) for n in set(old)|set(new) if old.get(n)!=new.get(n)}
+
+
+def remap(src="src/",new=None):
+    """
+    Move the files of an existing tree to follow the current mappings, only the
+    classes whose name changed are touched
+    :param new: mappings to follow, the ones the decompiler would apply by default
+    :return: how many files moved, None if the tree has no snapshot
+    """
+    old=loadSnapshot(src)
+    if old is None:
+        print("{} has no {}, it has to be rebuilt once with decompiler.py".format(src,decompiler.mappingsSnapshot))
+        return None
+    new=new if new is not None else decompiler.currentMappings()
+    if new is None:
+        print("Missing files mappings: obf and deobf")
+        return None
+    changes=diff(old,new)
+    #two classes can swap names, so everything is lifted out of the way before landing
+    lifted=[]
+    for nameObf,(before,after) in changes.items():
+        source=location(src,nameObf,before)
+        if source.exists():
+            parked=source.with_name(source.name+".remap")
+            os.replace(source.__str__(),parked.__str__())
+            lifted.append((parked,location(src,nameObf,after)))
+    for parked,destination in lifted:
+        destination.parent.mkdir(parents=True,exist_ok=True)
+        os.replace(parked.__str__(),destination.__str__())
+    for parked,_ in lifted:
+        prune(parked.parent,src)
+    #the class name renaming inside the sources is not a thing yet, so no file has to be rewritten
+    decompiler.saveSnapshot(new,src)
+    built=Path(src).joinpath(fingerprint.stampFile)
+    if built.exists():
+        #the tree now holds what a build with the new mappings gives
+        build=json.loads(built.read_text())
+        build["mappings"]=fingerprint.mappingsHash(new)
+        fingerprint.save(src,build)
+    if Path(src).joinpath(delta.manifestFile).exists():
+        delta.save(src)
+    return len(lifted)
+
+
+if __name__=="__main__":
+    #python remap.py [src dir]
+    t=time.time()
+    moved=remap(sys.argv[1] if len(sys.argv)>1 else "src/")
+    if moved is not None:
+        print("{} files moved in {:.3f}s".format(moved,time.time()-t))
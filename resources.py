@@ -0,0 +1,73 @@
+from pathlib import Path
+from shutil import copyfileobj
+from concurrent.futures import ThreadPoolExecutor
+import zipfile,zlib
+
+#readers working on the jar at the same time, each one has its own handle on it
+readers=4
+background=ThreadPoolExecutor(1)
+
+
+def safe(name):
+    """Whether an entry name stays inside the folder it is extracted to"""
+    parts=name.replace("\\","/").split("/")
+    return not name.startswith(("/","\\")) and ":" not in parts[0] and ".." not in parts
+
+
+def listResources(jar):
+    """Every non class entry of the jar: assets, data packs, lang files..."""
+    entries=[]
+    with zipfile.ZipFile(jar) as z:
+        for info in z.infolist():
+            if info.is_dir() or info.filename.endswith(".class"):
+                continue
+            if safe(info.filename):
+                entries.append(info)
+            else:
+                print("Skipping {}, it would land outside of the resources".format(info.filename))
+    return entries
+
+
+def crc(path):
+    value=0
+    with path.open("rb") as fid:
+        for block in iter(lambda:fid.read(1024*1024),b""):
+            value=zlib.crc32(block,value)
+    return value
+
+
+def extractSome(jar,entries,dest):
+    """Stream the given entries from the jar straight to dest"""
+    count=0
+    with zipfile.ZipFile(jar) as z:
+        for info in entries:
+            target=dest.joinpath(info.filename)
+            if target.exists() and target.stat().st_size==info.file_size and crc(target)==info.CRC:
+                #already there from a previous run or another version, reading it back beats inflating it
+                continue
+            target.parent.mkdir(parents=True,exist_ok=True)
+            with z.open(info) as source,target.open("wb") as fid:
+                copyfileobj(source,fid,1024*1024)
+            count+=1
+    return count
+
+
+def extract(jar,dest,workers=None):
+    """Extract the resources of the jar into dest with a pool of readers, return how many were written"""
+    workers=workers or readers
+    dest=Path(dest)
+    entries=listResources(jar)
+    #biggest first so the readers end at about the same time
+    entries.sort(key=lambda info:-info.compress_size)
+    chunks=[entries[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(workers) as pool:
+        return sum(pool.map(lambda chunk:extractSome(jar,chunk,dest),chunks))
+
+
+def extractInBackground(jar,dest,workers=None):
+    """
+    Start extracting the resources of the jar into dest, zlib lets the readers run
+    while the decompiler does its thing
+    :return: a future of the number of files written
+    """
+    return background.submit(extract,jar,dest,workers)
@@ -0,0 +1,144 @@
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer,BaseHTTPRequestHandler
+import api,backends,decompiler,jvm,threading,sys
+
+port=8013
+#sources kept in memory, the disk cache holds everything ever decompiled
+cacheSize=512
+cacheDir=Path("./cache")
+#siblings of a requested class decompiled in the background, in the same jvm
+prefetchCount=8
+
+
+class SourceCache(object):
+    """
+    Sources of one jar decompiled on demand, through an in-memory LRU backed by disk
+    """
+    def __init__(self,jar,mapping,engines=None):
+        self.jar=Path(jar).resolve()
+        self.mapping=mapping
+        self.reverse={d:o for o,d in mapping.items()}
+        self.engines=engines if engines is not None else backends.findBackends(Path(__file__).parent.joinpath("lib"))
+        self.classes=set(backends.listClasses(self.jar))
+        self.flags=jvm.flags(jvm.pick(),self.jar)
+        stat=self.jar.stat()
+        self.disk=cacheDir.joinpath("{}-{}-{}".format(self.jar.stem,stat.st_size,int(stat.st_mtime)))
+        self.disk.mkdir(parents=True,exist_ok=True)
+        self.memory=OrderedDict()
+        self.lock=threading.Lock()
+        #classes being decompiled right now, requests for them wait on the same event
+        self.inflight={}
+        self.prefetcher=ThreadPoolExecutor(1)
+
+    def resolve(self,name):
+        """Obfuscated name of a class given by either name, None if unknown"""
+        name=name.strip("/").replace(".","/")
+        if name.endswith("/java"):
+            name=name[:-5]
+        if name in self.reverse:
+            return self.reverse[name]
+        if name in self.classes:
+            return name
+
+    def remember(self,nameObf,source):
+        with self.lock:
+            self.memory[nameObf]=source
+            self.memory.move_to_end(nameObf)
+            while len(self.memory)>cacheSize:
+                self.memory.popitem(last=False)
+
+    def cached(self,nameObf):
+        with self.lock:
+            if nameObf in self.memory:
+                self.memory.move_to_end(nameObf)
+                return self.memory[nameObf]
+        file=self.disk.joinpath(nameObf+".java")
+        if file.exists():
+            source=file.read_text(errors="replace")
+            self.remember(nameObf,source)
+            return source
+
+    def load(self,names):
+        """Decompile the given classes in one go, unless another thread already is"""
+        with self.lock:
+            mine=[n for n in names if n not in self.inflight]
+            for n in mine:
+                self.inflight[n]=threading.Event()
+            waiting=[self.inflight[n] for n in names if n not in mine]
+        try:
+            if mine:
+                for nameObf,source in api.decompileBatch(self.jar,mine,self.engines,self.flags,backends.statsFile).items():
+                    file=self.disk.joinpath(nameObf+".java")
+                    file.parent.mkdir(parents=True,exist_ok=True)
+                    file.write_text(source)
+                    self.remember(nameObf,source)
+        finally:
+            with self.lock:
+                for n in mine:
+                    self.inflight.pop(n).set()
+        for event in waiting:
+            event.wait()
+
+    def neighbours(self,nameObf):
+        """Classes of the same package that are not cached yet, likely to be asked next"""
+        nameDeObf=self.mapping.get(nameObf)
+        if not nameDeObf:
+            return []
+        package=nameDeObf.rsplit("/",1)[0]+"/"
+        siblings=sorted(self.reverse[d] for d in self.reverse if d.startswith(package) and "/" not in d[len(package):])
+        return [n for n in siblings if n!=nameObf and n not in self.memory
+                and not self.disk.joinpath(n+".java").exists()][:prefetchCount]
+
+    def get(self,name):
+        """Source of a class, deobfuscated or obfuscated name, None if unknown or undecompilable"""
+        nameObf=self.resolve(name)
+        if nameObf is None:
+            return None
+        source=self.cached(nameObf)
+        if source is None:
+            self.load([nameObf])
+            source=self.cached(nameObf)
+            nearby=self.neighbours(nameObf)
+            if nearby:
+                self.prefetcher.submit(self.load,nearby)
+        return source
+
+
+class Handler(BaseHTTPRequestHandler):
+    cache=None
+
+    def do_GET(self):
+        source=self.cache.get(self.path.split("?")[0])
+        if source is None:
+            self.send_error(404,"Unknown class {}".format(self.path))
+            return
+        body=source.encode()
+        self.send_response(200)
+        self.send_header("Content-Type","text/x-java-source; charset=utf-8")
+        self.send_header("Content-Length",str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,format,*args):
+        pass
+
+
+def serve(jar,mapping,port=port):
+    """Serve GET /net/minecraft/world/chunk/Chunk on localhost until killed"""
+    Handler.cache=SourceCache(jar,mapping)
+    httpd=ThreadingHTTPServer(("127.0.0.1",port),Handler)
+    print("Serving the sources of {} on http://127.0.0.1:{}/".format(jar,port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__=="__main__":
+    #python server.py [port]
+    path=decompiler.findjar()
+    if path:
+        mapping=api.loadMappings("./filesMappings/classes-obf.txt","./filesMappings/classes-deobf.txt")
+        serve(path,mapping,int(sys.argv[1]) if len(sys.argv)>1 else port)
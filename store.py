@@ -0,0 +1,133 @@
+from pathlib import Path
+import hashlib,tempfile,stat,sys,os
+
+#content addressed blobs shared by every decompiled version, they must be on the same drive as the src dirs
+storeDir=Path("./store")
+#ioctl asking btrfs/xfs for a copy on write clone
+FICLONE=0x40049409
+#blobs are shared by every tree linking them, nobody may write through one
+READONLY=0o444
+#set once the trees could not be linked to the store (another drive), they get plain files from then on
+copying=False
+
+
+def blobPath(digest):
+    return storeDir.joinpath("blobs",digest[:2],digest[2:])
+
+
+def putBlob(data):
+    """Write data in the store unless it is already there, return its blob"""
+    digest=hashlib.sha256(data).hexdigest()
+    blob=blobPath(digest)
+    if blob.exists() and blob.stat().st_mode&stat.S_IWUSR:
+        #older stores had writable blobs (and windows has to unprotect one to remove a link to it), it may have been edited through a tree
+        if hashlib.sha256(blob.read_bytes()).hexdigest()==digest:
+            os.chmod(blob.__str__(),READONLY)
+        else:
+            #the trees linking it keep what they have
+            blob.unlink()
+    if not blob.exists():
+        blob.parent.mkdir(parents=True,exist_ok=True)
+        #write then rename so a half written blob never gets linked
+        fd,temp=tempfile.mkstemp(dir=blob.parent.__str__())
+        with os.fdopen(fd,"wb") as fid:
+            fid.write(data)
+        os.chmod(temp,READONLY)
+        os.replace(temp,blob.__str__())
+    return blob
+
+
+def remove(path):
+    """Unlink a file, windows refuses to on a read-only one"""
+    try:
+        path.unlink()
+    except PermissionError:
+        os.chmod(path.__str__(),stat.S_IWRITE|stat.S_IREAD)
+        path.unlink()
+
+
+def reflink(blob,destination):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(blob,"rb") as source,open(destination,"wb") as fid:
+        try:
+            fcntl.ioctl(fid.fileno(),FICLONE,source.fileno())
+            return True
+        except OSError:
+            pass
+    destination.unlink()
+    return False
+
+
+def place(data,destination):
+    """
+    Put data at destination through the store: a hardlink to the blob, a reflink
+    if the filesystem can't hardlink, a plain file if it can't do either
+    """
+    global copying
+    destination=Path(destination)
+    blob=None if copying else putBlob(data)
+    if destination.exists():
+        if blob and destination.samefile(blob):
+            return
+        #never write through a hardlink, other versions share it
+        remove(destination)
+    if blob:
+        try:
+            os.link(blob.__str__(),destination.__str__())
+            return
+        except OSError:
+            if reflink(blob,destination):
+                return
+        #a copy next to the blob would take the disk twice
+        print("Could not link {} to the store, keep {} on the same drive as the trees. Writing plain files instead".format(destination,storeDir))
+        copying=True
+        if blob.stat().st_nlink==1:
+            remove(blob)
+    with destination.open("wb") as fid:
+        fid.write(data)
+
+
+def gc():
+    """Remove the blobs no tree links to anymore, return the bytes freed"""
+    freed=0
+    for blob in storeDir.joinpath("blobs").glob("*/*"):
+        info=blob.stat()
+        if info.st_nlink==1:
+            freed+=info.st_size
+            remove(blob)
+    for folder in storeDir.joinpath("blobs").glob("*"):
+        if folder.is_dir() and not any(folder.iterdir()):
+            folder.rmdir()
+    return freed
+
+
+def report(roots):
+    """
+    Logical bytes of the trees against what they really take on disk, blobs
+    of the store included
+    :return: (logical, physical)
+    """
+    logical=0
+    seen={}
+    for root in list(roots)+[storeDir.joinpath("blobs")]:
+        for folder,_,files in os.walk(root):
+            for name in files:
+                info=os.stat(os.path.join(folder,name))
+                if root!=storeDir.joinpath("blobs"):
+                    logical+=info.st_size
+                seen[(info.st_dev,info.st_ino)]=info.st_size
+    return logical,sum(seen.values())
+
+
+if __name__=="__main__":
+    #python store.py gc | python store.py report src/ src1.13.2/ ...
+    if len(sys.argv)>1 and sys.argv[1]=="gc":
+        print("Freed {} bytes".format(gc()))
+    elif len(sys.argv)>2 and sys.argv[1]=="report":
+        logical,physical=report(sys.argv[2:])
+        print("Logical {:.1f} MB, physical {:.1f} MB, {:.1f}x saved".format(logical/1e6,physical/1e6,logical/max(physical,1)))
+    else:
+        print("Usage: python store.py gc | python store.py report dir [dir...]")
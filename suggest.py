@@ -0,0 +1,98 @@
+from pathlib import Path
+from collections import Counter,defaultdict
+import classfile,decompiler,time,re
+
+reportFile=Path("./wtf-suggestions.txt")
+#how much a neighbour tells about where a class belongs
+weights={"extends":3,"implements":2,"extended by":2,"uses":1,"used by":1}
+word=re.compile(r"[A-Z]?[a-z]{3,}")
+
+
+def references(c):
+    """Classes a class mentions: its constant pool and the descriptors of its members"""
+    found={c.className(i) for i,entry in enumerate(c.pool) if entry and entry[0]==classfile.CLASS}
+    for _,_,descriptor,_ in c.fields+c.methods:
+        found.update(classfile.reference.findall(descriptor))
+    found.discard(c.name)
+    return {n.split("$")[0] for n in found if not n.startswith("[")}
+
+
+def index(jar):
+    """
+    One pass over the jar: {class: [(relation, other class)]} for every hierarchy and reference
+    edge, both ways, and the string constants of each class
+    """
+    classes=classfile.readJar(jar)
+    edges=defaultdict(list)
+    strings={}
+    for name,c in classes.items():
+        strings[name]=c.strings()
+        if c.superName and c.superName!="java/lang/Object":
+            edges[name].append(("extends",c.superName))
+            edges[c.superName].append(("extended by",name))
+        for i in c.interfaces:
+            edges[name].append(("implements",i))
+            edges[i].append(("extended by",name))
+        for other in references(c):
+            edges[name].append(("uses",other))
+            edges[other].append(("used by",name))
+    return classes,edges,strings
+
+
+def nameFrom(nameObf,edges,strings,mapping):
+    """Placeholder name telling what the class is: its mapped parent, else a word of its strings"""
+    for relation,other in edges[nameObf]:
+        if relation in ("extends","implements") and other in mapping:
+            return mapping[other].split("/")[-1]+"_"+nameObf
+    words=Counter(w.capitalize() for s in strings.get(nameObf,()) for w in word.findall(s))
+    if words:
+        return words.most_common(1)[0][0]+"_"+nameObf
+    return "Class_"+nameObf
+
+
+def suggest(jar,mapping):
+    """
+    Package and name for every class of the jar the mappings don't know, voted by its mapped
+    neighbours
+    :return: [(obfuscated, suggestion, confidence, strongest neighbour)] best first
+    """
+    classes,edges,strings=index(jar)
+    suggestions=[]
+    for nameObf in classes:
+        if "/" in nameObf or nameObf in mapping:
+            continue
+        votes=Counter()
+        best={}
+        for relation,other in edges[nameObf]:
+            if other in mapping:
+                package=mapping[other].rsplit("/",1)[0]
+                votes[package]+=weights[relation]
+                if weights[relation]>best.get(package,(0,))[0]:
+                    best[package]=(weights[relation],"{} {}".format(relation,mapping[other]))
+        if not votes:
+            suggestions.append((nameObf,"wtf/"+nameFrom(nameObf,edges,strings,mapping),0.0,"no mapped neighbour"))
+            continue
+        package,score=votes.most_common(1)[0]
+        #share of the votes, damped when there are only a few of them
+        total=sum(votes.values())
+        confidence=score/total*min(1.0,total/6)
+        suggestions.append((nameObf,package+"/"+nameFrom(nameObf,edges,strings,mapping),confidence,best[package][1]))
+    suggestions.sort(key=lambda s:-s[2])
+    return suggestions
+
+
+def report(suggestions,path=reportFile):
+    with open(path,"w") as fid:
+        fid.write("# confidence\tobfuscated\tsuggestion\tstrongest neighbour\n")
+        for nameObf,suggestion,confidence,why in suggestions:
+            fid.write("{:.2f}\t{}\t{}\t{}\n".format(confidence,nameObf,suggestion,why))
+
+
+if __name__=="__main__":
+    t=time.time()
+    path=decompiler.findjar()
+    mapping=decompiler.currentMappings()
+    if path and mapping is not None:
+        suggestions=suggest(path,mapping)
+        report(suggestions)
+        print("{} unmapped classes placed in {:.1f}s, see {}".format(len(suggestions),time.time()-t,reportFile))
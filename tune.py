@@ -0,0 +1,88 @@
+from pathlib import Path
+import backends,decompiler,jvm,tempfile,statistics,json,time,sys
+
+#cfr passes that cost time on obfuscated code, each one tried alone then the helpful ones together
+candidates=[
+    ("--decodefinally","false"),
+    ("--decodelambdas","false"),
+    ("--relinkconststring","false"),
+    ("--removeinnerclasssynthetics","false"),
+    ("--recover","false"),
+    ("--forcetopsort","true"),
+]
+#failure rate an option set may add over the defaults and still be recommended
+tolerance=0.005
+#speedup below which an option set is just noise
+minGain=1.05
+#timed runs of each option set, interleaved so the warming jvm and page cache favour none of them
+rounds=3
+
+
+def measure(cfr,jar,classes,options):
+    """(classes per second, failure rate) of one cfr run with the given options on the sample"""
+    cfr.options=backends.CFR.options+tuple(options)
+    with tempfile.TemporaryDirectory() as out:
+        t=time.time()
+        backends.run(cfr,jar,Path(out),classes)
+        elapsed=time.time()-t
+        failed=len(backends.collect(cfr,Path(out),Path(out),classes,{}))
+    return len(classes)/elapsed,failed/len(classes)
+
+
+def compare(cfr,jar,classes,optionSets):
+    """{options: (median classes per second, worst failure rate)} over rounds interleaved runs"""
+    speeds={options:[] for options in optionSets}
+    rates={options:0.0 for options in optionSets}
+    for _ in range(rounds):
+        for options in optionSets:
+            speed,rate=measure(cfr,jar,classes,options)
+            speeds[options].append(speed)
+            rates[options]=max(rates[options],rate)
+    results={}
+    for options in optionSets:
+        results[options]=statistics.median(speeds[options]),rates[options]
+        print("{:<60}{:>8.1f} classes/s{:>8.1%} failed".format(" ".join(options) or "(defaults)",*results[options]))
+    return results
+
+
+def tune(jar,n=300):
+    """
+    Time cfr on a stratified sample of the jar under each candidate option set, after a warm-up
+    and over interleaved rounds, and write the fastest one that fails no more than the defaults
+    in cfrProfile.json
+    """
+    cfr=[b for b in backends.findBackends() if isinstance(b,backends.CFR)]
+    if not cfr:
+        print("Missing a library: CFR")
+        return None
+    cfr=cfr[0]
+    jar=Path(jar).resolve()
+    backends.jvmFlags=jvm.flags(jvm.pick(),jar)
+    classes=jvm.sample(jar,n)
+    #warm-up, not counted: the first run pays the cold jvm and page cache
+    measure(cfr,jar,classes,())
+    results=compare(cfr,jar,classes,[()]+candidates)
+    baseSpeed,baseRate=results[()]
+    helpful=[]
+    for options in candidates:
+        speed,rate=results[options]
+        if speed>baseSpeed*minGain and rate<=baseRate+tolerance:
+            helpful+=list(options)
+    if len(helpful)>2:
+        combined=compare(cfr,jar,classes,[(),tuple(helpful)])
+        speed,rate=combined[tuple(helpful)]
+        #timed against its own baseline runs, brought back to the scale of the first ones
+        results[tuple(helpful)]=speed*baseSpeed/combined[()][0],rate
+    eligible=[()]+[o for o,(speed,rate) in results.items() if speed>baseSpeed*minGain and rate<=baseRate+tolerance]
+    best=max(eligible,key=lambda o:results[o][0])
+    backends.profileFile.write_text(json.dumps({"options":list(best),"sample":len(classes),
+        "results":[{"options":list(o),"classesPerSecond":s,"failureRate":r} for o,(s,r) in results.items()]},indent=1))
+    print("Recommended: {}, written in {}".format(" ".join(best) or "the defaults",backends.profileFile))
+    return best
+
+
+if __name__=="__main__":
+    #python tune.py [sample size]
+    path=decompiler.findjar()
+    if path:
+        tune(path,int(sys.argv[1]) if len(sys.argv)>1 else 300)
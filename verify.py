@@ -0,0 +1,132 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import JDKcheck,decompiler,fingerprint,jvm,remap,tempfile,hashlib,json,subprocess,sys,re,os,time
+
+#sources per javac process
+batchSize=300
+#file in the tree remembering the result of every source at its last check
+stateFile=".verify.json"
+reportFile=Path("./verify-report.txt")
+errorLine=re.compile(r"^(.*\.java):(\d+): error: (.*)$")
+
+
+def findJavac():
+    """javac of the JDK JDKcheck finds, the one on the PATH otherwise"""
+    try:
+        home=Path(JDKcheck.main()).parent
+    except RuntimeError:
+        return "javac"
+    for name in ("javac","javac.exe"):
+        if home.joinpath("bin",name).exists():
+            return home.joinpath("bin",name).__str__()
+    return "javac"
+
+
+def sources(src):
+    """{path relative to src: obfuscated name} of the decompiled classes of a tree"""
+    snapshot=remap.loadSnapshot(src) or {}
+    reverse={d+".java":o for o,d in snapshot.items()}
+    found={}
+    for file in Path(src).rglob("*.java"):
+        relative=file.relative_to(src).as_posix()
+        if relative in reverse:
+            found[relative]=reverse[relative]
+        elif relative.startswith("wtf/"):
+            found[relative]=file.stem
+        else:
+            #packaged classes were never renamed
+            found[relative]=relative[:-5]
+    return found
+
+
+def digest(file):
+    return hashlib.sha1(file.read_bytes()).hexdigest()
+
+
+def compileBatch(javac,jar,src,batch,heap=1024*jvm.MB):
+    """
+    Compile some sources against the original jar, return {relative path: [errors]}
+    The sources still declare their obfuscated names, so each one is staged under it for javac.
+    :param heap: bytes javac may take
+    """
+    errors={relative:[] for relative in batch}
+    with tempfile.TemporaryDirectory() as stage:
+        staged={}
+        for relative,nameObf in batch.items():
+            target=Path(stage).joinpath("src",nameObf+".java")
+            target.parent.mkdir(parents=True,exist_ok=True)
+            target.write_bytes(Path(src).joinpath(relative).read_bytes())
+            staged[os.path.normcase(target.__str__())]=relative
+        out=Path(stage).joinpath("classes")
+        out.mkdir()
+        #an argument file, windows can't take hundreds of paths on a command line
+        argfile=Path(stage).joinpath("args")
+        argfile.write_text("\n".join('"{}"'.format(p.replace("\\","/")) for p in staged))
+        result=subprocess.run([javac,"-J-Xmx{}m".format(heap//jvm.MB),"-encoding","UTF-8","-nowarn","-proc:none","-implicit:none",
+                               "-Xmaxerrs","100000","-cp",Path(jar).__str__(),"-d",out.__str__(),"@"+argfile.__str__()],
+                              stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True,errors="replace")
+        for line in result.stdout.splitlines():
+            match=errorLine.match(line)
+            if match:
+                relative=staged.get(os.path.normcase(match.group(1)))
+                if relative:
+                    errors[relative].append("{}: {}".format(match.group(2),match.group(3)))
+        if result.returncode and not any(errors.values()):
+            #javac died without blaming a file, blame the whole batch
+            for relative in errors:
+                errors[relative].append(result.stdout.strip().splitlines()[-1] if result.stdout.strip() else "javac failed")
+    return errors
+
+
+def verify(src,jar,workers=None):
+    """
+    Check that the tree compiles against the original jar, javac runs in parallel on batches
+    of the sources that changed since the last check
+    :return: {relative path: [errors]} of every source of the tree
+    """
+    workers=workers or jvm.availableCpus()
+    state=Path(src).joinpath(stateFile)
+    previous={}
+    jarFingerprint=fingerprint.fingerprint(jar)
+    if state.exists():
+        saved=json.loads(state.read_text())
+        #against another jar nothing of the previous check holds
+        if saved.get("jar")==jarFingerprint:
+            previous=saved["files"]
+    found=sources(src)
+    hashes={relative:digest(Path(src).joinpath(relative)) for relative in found}
+    todo={r:n for r,n in found.items() if r not in previous or previous[r]["hash"]!=hashes[r]}
+    print("{} sources to check, {} unchanged".format(len(todo),len(found)-len(todo)))
+    #with the jar on the classpath every dependency comes from bytecode, so the batches are independent
+    names=sorted(todo)
+    batches=[{r:todo[r] for r in names[i:i+batchSize]} for i in range(0,len(names),batchSize)]
+    javac=findJavac()
+    #the javacs running side by side split the memory, like the decompiler jvms
+    heap=max(64*jvm.MB,jvm.availableMemory()//max(1,min(workers,len(batches)))*3//4)
+    results={r:previous[r]["errors"] for r in found if r not in todo}
+    with ThreadPoolExecutor(workers) as pool:
+        for errors in pool.map(lambda batch:compileBatch(javac,jar,src,batch,heap),batches):
+            results.update(errors)
+    state.write_text(json.dumps({"jar":jarFingerprint,"files":{r:{"hash":hashes[r],"errors":results[r]} for r in found}},indent=1))
+    return results
+
+
+def report(results,path=reportFile):
+    failing={r:e for r,e in results.items() if e}
+    with open(path,"w") as fid:
+        fid.write("{} of {} classes compile\n\n".format(len(results)-len(failing),len(results)))
+        for relative in sorted(failing):
+            fid.write("{} ({} errors)\n".format(relative,len(failing[relative])))
+            for error in failing[relative]:
+                fid.write("    line {}\n".format(error))
+    return len(failing)
+
+
+if __name__=="__main__":
+    #python verify.py [src dir]
+    t=time.time()
+    path=decompiler.findjar()
+    if path:
+        results=verify(sys.argv[1] if len(sys.argv)>1 else "src/",path)
+        failing=report(results)
+        print("{} of {} classes compile, details in {} ({:.1f}s)".format(len(results)-failing,len(results),reportFile,time.time()-t))
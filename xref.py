@@ -0,0 +1,148 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from struct import unpack_from
+import classfile,decompiler,fingerprint,jvm,sqlite3,zipfile,struct,time,sys
+
+dbFile=Path("./xref.db")
+#classes parsed by a worker at once
+chunkSize=500
+
+CALL,READ,WRITE="call","read","write"
+kinds={classfile.INVOKEVIRTUAL:CALL,classfile.INVOKESPECIAL:CALL,classfile.INVOKESTATIC:CALL,classfile.INVOKEINTERFACE:CALL,
+       classfile.GETFIELD:READ,classfile.GETSTATIC:READ,classfile.PUTFIELD:WRITE,classfile.PUTSTATIC:WRITE}
+
+schema="""
+create table if not exists meta(key text primary key,value text);
+create table if not exists members(id integer primary key,owner text not null,name text not null,descriptor text not null);
+create unique index if not exists membersByName on members(owner,name,descriptor);
+create table if not exists edges(source integer not null,target integer not null,kind text not null);
+create index if not exists edgesByTarget on edges(target,kind);
+create index if not exists edgesBySource on edges(source,kind);
+"""
+
+
+def scan(jar,names):
+    """(kind, (owner, name, descriptor) of the method, (owner, name, descriptor) it uses) of some classes"""
+    edges=[]
+    with zipfile.ZipFile(jar) as z:
+        for name in names:
+            try:
+                c=classfile.ClassFile(z.read(name))
+            except (ValueError,IndexError,KeyError,struct.error) as e:
+                print("Could not parse {}: {}".format(name,e))
+                continue
+            for _,member,descriptor,code in c.methods:
+                if code is None:
+                    continue
+                source=(c.name,member,descriptor)
+                seen=set()
+                for pc,op in classfile.instructions(code):
+                    if op in kinds:
+                        edge=(kinds[op],c.ref(unpack_from(">H",code,pc+1)[0]))
+                        if edge not in seen:
+                            seen.add(edge)
+                            edges.append((edge[0],source,edge[1]))
+    return edges
+
+
+def translator(mapping):
+    """Function renaming a (owner, name, descriptor) through the class mappings"""
+    def className(n):
+        outer,dollar,inner=n.partition("$")
+        return mapping.get(outer,outer)+dollar+inner
+
+    def translate(member):
+        owner,name,descriptor=member
+        #arrays show up as owners of methods like clone()
+        owner=classfile.reference.sub(lambda m:"L"+className(m.group(1))+";",owner) if owner.startswith("[") else className(owner)
+        return owner,name,classfile.reference.sub(lambda m:"L"+className(m.group(1))+";",descriptor)
+    return translate
+
+
+def build(jar,mapping,workers=None):
+    """Scan every method of the jar in parallel and store the edges, translated, in xref.db"""
+    workers=workers or jvm.availableCpus()
+    with zipfile.ZipFile(jar) as z:
+        names=[n for n in z.namelist() if n.endswith(".class")]
+    chunks=[names[i:i+chunkSize] for i in range(0,len(names),chunkSize)]
+    translate=translator(mapping)
+    if dbFile.exists():
+        dbFile.unlink()
+    db=sqlite3.connect(dbFile.__str__())
+    db.executescript(schema)
+    ids={}
+
+    def memberId(member):
+        member=translate(member)
+        if member not in ids:
+            ids[member]=len(ids)+1
+        return ids[member]
+
+    count=0
+    with db,ProcessPoolExecutor(workers) as pool:
+        for edges in pool.map(scan,[jar]*len(chunks),chunks):
+            rows=[(memberId(source),memberId(target),kind) for kind,source,target in edges]
+            db.executemany("insert into edges(source,target,kind) values (?,?,?)",rows)
+            count+=len(rows)
+        db.executemany("insert into members(id,owner,name,descriptor) values (?,?,?,?)",
+                       [(i,)+member for member,i in ids.items()])
+        db.executemany("insert into meta(key,value) values (?,?)",[("jar",fingerprint.fingerprint(jar)),("mappings",fingerprint.mappingsHash(mapping))])
+    db.close()
+    return count
+
+
+def upToDate(jar,mapping):
+    if not dbFile.exists():
+        return False
+    db=sqlite3.connect(dbFile.__str__())
+    try:
+        meta=dict(db.execute("select key,value from meta").fetchall())
+    except sqlite3.Error:
+        return False
+    finally:
+        db.close()
+    return meta.get("jar")==fingerprint.fingerprint(jar) and meta.get("mappings")==fingerprint.mappingsHash(mapping)
+
+
+def query(member,kinds,incoming=True):
+    """
+    Members linked to another one
+    :param member: "owner.name" or "owner.name(descriptor)", owner deobfuscated when mapped
+    :param incoming: who uses member if True, what member uses otherwise
+    :return: [(kind, owner, name, descriptor)]
+    """
+    owner,_,rest=member.rpartition(".")
+    name,_,descriptor=rest.partition("(")
+    here,there=("target","source") if incoming else ("source","target")
+    sql=("select e.kind,m.owner,m.name,m.descriptor from members t join edges e on e.{} = t.id "
+         "join members m on m.id = e.{} where t.owner=? and t.name=? and e.kind in ({})").format(here,there,",".join("?"*len(kinds)))
+    args=[owner,name]+list(kinds)
+    if descriptor:
+        sql+=" and t.descriptor=?"
+        args.append("("+descriptor)
+    db=sqlite3.connect(dbFile.__str__())
+    rows=db.execute(sql+" order by m.owner,m.name",args).fetchall()
+    db.close()
+    return rows
+
+
+commands={"callers":((CALL,),True),"calls":((CALL,),False),"readers":((READ,),True),
+          "writers":((WRITE,),True),"accessors":((READ,WRITE),True),"uses":((CALL,READ,WRITE),False)}
+
+
+if __name__=="__main__":
+    #python xref.py build | python xref.py callers|calls|readers|writers|accessors|uses owner.member[(descriptor)]
+    if len(sys.argv)==2 and sys.argv[1]=="build":
+        t=time.time()
+        path=decompiler.findjar()
+        mapping=decompiler.currentMappings() or {}
+        if path:
+            if upToDate(path,mapping):
+                print("{} is up to date".format(dbFile))
+            else:
+                print("{} edges indexed in {:.1f}s".format(build(path,mapping),time.time()-t))
+    elif len(sys.argv)==3 and sys.argv[1] in commands:
+        for kind,owner,name,descriptor in query(sys.argv[2],*commands[sys.argv[1]]):
+            print("{}\t{}.{}{}".format(kind,owner,name,descriptor))
+    else:
+        print("Usage: python xref.py build | python xref.py {} owner.member[(descriptor)]".format("|".join(commands)))